@@ -0,0 +1,121 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from docx_media import MediaExtractor, media_dir_for
+from extract_docx import Paragraph, iter_paragraphs
+from process_text import process_paragraphs_streaming
+
+def find_documents(target):
+    # A directory means every .docx inside it; anything else is a glob
+    if os.path.isdir(target):
+        pattern = os.path.join(target, '*.docx')
+    else:
+        pattern = target
+    # Skip Word lock files ("~$name.docx")
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if path.lower().endswith('.docx') and not os.path.basename(path).startswith('~$'))
+
+def output_names(paths):
+    # One output stem per document, disambiguated when two folders hold
+    # documents with the same name
+    seen = {}
+    names = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = seen.get(stem, 0)
+        seen[stem] = count + 1
+        names.append(stem if count == 0 else f"{stem}-{count + 1}")
+    return names
+
+def document_title(first, docx_path):
+    # The first record is the title (as in process_text); documents that
+    # open with a table, a picture or an empty line fall back to the file name
+    if isinstance(first, Paragraph) and first.text.strip():
+        return first.text.strip()
+    return os.path.splitext(os.path.basename(docx_path))[0]
+
+def convert_document(docx_path, output_dir, name):
+    # Runs in a worker process. Never raises: failures are reported in the
+    # returned record so one bad document cannot abort the batch.
+    output_html = os.path.join(output_dir, f"{name}.html")
+    output_md = os.path.join(output_dir, f"{name}.md")
+    record = {'source': docx_path, 'html': output_html, 'md': output_md}
+    started = time.perf_counter()
+    counter = {'paragraphs': 0}
+
+    def counted(paragraphs):
+        for paragraph in paragraphs:
+            counter['paragraphs'] += 1
+            yield paragraph
+
+    try:
+        media = MediaExtractor(media_dir_for(output_html))
+        paragraphs = iter_paragraphs(docx_path, media)
+        first = next(paragraphs, None)
+        title = document_title(first, docx_path)
+        if first is not None:
+            paragraphs = itertools.chain([first], paragraphs)
+        toc = process_paragraphs_streaming(counted(paragraphs), output_html, output_md, title=title)
+    except Exception as e:
+        for path in (output_html, output_md):
+            if os.path.exists(path):
+                os.remove(path)
+        record.update(status='error', error=f"{type(e).__name__}: {e}", html=None, md=None)
+    else:
+        record.update(status='ok', error=None, title=title, sections=len(toc), images=media.extracted + media.skipped)
+    record['paragraphs'] = counter['paragraphs']
+    record['seconds'] = round(time.perf_counter() - started, 4)
+    return record
+
+def convert_batch(target, output_dir, workers=None):
+    paths = find_documents(target)
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(convert_document, path, output_dir, name): path
+                   for path, name in zip(paths, output_names(paths))}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or out of memory)
+                results[path] = {'source': path, 'html': None, 'md': None, 'status': 'error',
+                                 'error': f"{type(e).__name__}: {e}"}
+
+    documents = [results[path] for path in paths]
+    manifest = {
+        'target': target,
+        'workers': workers or os.cpu_count(),
+        'seconds': round(time.perf_counter() - started, 4),
+        'ok': sum(1 for doc in documents if doc['status'] == 'ok'),
+        'failed': sum(1 for doc in documents if doc['status'] != 'ok'),
+        'documents': documents,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a directory or glob of .docx files to HTML and Markdown")
+    parser.add_argument('target', help="directory or glob, e.g. 'books/**/*.docx'")
+    parser.add_argument('-o', '--output-dir', default="converted")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    manifest = convert_batch(args.target, args.output_dir, args.workers)
+    for doc in manifest['documents']:
+        if doc['status'] == 'ok':
+            print(f"OK     {doc['source']} ({doc['paragraphs']} paragraphs, {doc['seconds']}s)")
+        else:
+            print(f"FAILED {doc['source']}: {doc['error']}")
+    print(f"{manifest['ok']} converted, {manifest['failed']} failed in {manifest['seconds']}s "
+          f"-> {os.path.join(args.output_dir, 'manifest.json')}")
@@ -0,0 +1,186 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from synth_docx import write_synthetic_docx
+from extract_docx import iter_paragraphs
+from process_text import process_text
+from generate_toc import generate_toc
+from cleanup_and_regenerate import cleanup_and_regenerate
+from cleanup_html import cleanup_html
+from pipeline import build
+
+BENCH_VERSION = 1
+DEFAULT_SIZES = [1000, 10000]
+
+def _extract(docx_path, txt_path):
+    # Same output as extract_docx.py's __main__
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        for i, paragraph in enumerate(iter_paragraphs(docx_path)):
+            if i:
+                f.write('\n')
+            f.write(paragraph.text)
+
+def _copy(src, dst):
+    shutil.copyfile(src, dst)
+    return dst
+
+def stages(work):
+    # (name, setup, run) in chain order. setup prepares fresh inputs outside
+    # the measured region, since several scripts rewrite their file in place.
+    p = lambda name: os.path.join(work, name)
+    return [
+        ('extract_docx', lambda: None,
+         lambda: _extract(p('book.docx'), p('extracted.txt'))),
+        ('process_text', lambda: None,
+         lambda: process_text(p('extracted.txt'), p('legacy.html'), p('legacy.md'))),
+        ('process_text_stream', lambda: None,
+         lambda: process_text(p('extracted.txt'), p('stream.html'), p('stream.md'), stream=True)),
+        ('generate_toc', lambda: _copy(p('legacy.md'), p('toc.md')),
+         lambda: generate_toc(p('toc.md'))),
+        ('cleanup_and_regenerate', lambda: _copy(p('legacy.md'), p('regen.md')),
+         lambda: cleanup_and_regenerate(p('regen.md'))),
+        ('cleanup_html', lambda: _copy(p('legacy.html'), p('clean.html')),
+         lambda: cleanup_html(p('clean.html'))),
+        ('pipeline_build', lambda: None,
+         lambda: build(p('book.docx'), p('pipeline.html'), p('pipeline.md'))),
+    ]
+
+STAGE_NAMES = [name for name, _, _ in stages('')]
+
+# Stages whose output a stage reads
+PREREQUISITES = {
+    'process_text': ['extract_docx'],
+    'process_text_stream': ['extract_docx'],
+    'generate_toc': ['process_text'],
+    'cleanup_and_regenerate': ['process_text'],
+    'cleanup_html': ['process_text'],
+}
+
+def with_prerequisites(names):
+    # names plus every stage they depend on, directly or not
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(PREREQUISITES.get(name, []))
+    return needed
+
+def measure(setup, run, memory=True):
+    # Wall and CPU time come from an untraced run; tracemalloc slows Python
+    # allocations down a lot, so the peak is taken from a second run.
+    setup()
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        run()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        peak = None
+        if memory:
+            setup()
+            tracemalloc.start()
+            try:
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return {'seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4), 'peak_bytes': peak}
+
+def bench_size(paragraphs, seed=0, memory=True, only=None):
+    work = tempfile.mkdtemp(prefix='bench_')
+    try:
+        docx_path = os.path.join(work, 'book.docx')
+        start = time.perf_counter()
+        write_synthetic_docx(docx_path, paragraphs, seed)
+        result = {
+            'paragraphs': paragraphs,
+            'docx_bytes': os.path.getsize(docx_path),
+            'generate_seconds': round(time.perf_counter() - start, 4),
+            'stages': {},
+        }
+        end_to_end = 0.0
+        needed = with_prerequisites(only) if only else None
+        for name, setup, run in stages(work):
+            if needed is not None and name not in needed:
+                continue
+            if only and name not in only:
+                # Only there to produce the inputs of a selected stage
+                with contextlib.redirect_stdout(io.StringIO()):
+                    setup()
+                    run()
+                continue
+            stage = measure(setup, run, memory)
+            result['stages'][name] = stage
+            # The legacy chain: extract -> process -> TOC -> cleanups
+            if name not in ('process_text_stream', 'pipeline_build'):
+                end_to_end += stage['seconds']
+            print(f"  {name:24} {stage['seconds']:9.3f}s"
+                  + (f" {stage['peak_bytes'] / 1e6:9.1f} MB" if stage['peak_bytes'] is not None else ''))
+        result['legacy_chain_seconds'] = round(end_to_end, 4)
+        return result
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current):
+    # Print current/previous time ratios per size and stage
+    before = {r['paragraphs']: r for r in previous['results']}
+    for result in current['results']:
+        old = before.get(result['paragraphs'])
+        if old is None:
+            continue
+        print(f"{result['paragraphs']} paragraphs vs {previous.get('commit') or 'previous'}:")
+        for name, stage in result['stages'].items():
+            if name in old['stages'] and old['stages'][name]['seconds']:
+                ratio = stage['seconds'] / old['stages'][name]['seconds']
+                flag = '  <-- slower' if ratio > 1.2 else ''
+                print(f"  {name:24} {ratio:6.2f}x{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the book pipeline on synthetic documents")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="paragraph counts to generate (e.g. 1000 100000 500000)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stage', action='append', choices=STAGE_NAMES,
+                        help="only time these stages (repeatable); the stages they read from run untimed")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('-o', '--output', default="bench_results.json")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results to compare against")
+    args = parser.parse_args()
+
+    report = {
+        'version': BENCH_VERSION,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': [],
+    }
+    for size in args.sizes:
+        print(f"{size} paragraphs:")
+        report['results'].append(bench_size(size, args.seed, not args.no_memory, args.stage))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+import process_text
+
+# Bump when the cached fragment format changes
+CACHE_VERSION = 1
+
+def _renderer_fingerprint():
+    # Cached fragments are only valid for the renderer that produced them
+    with open(process_text.__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def scope_name(source):
+    # Folder name for one source's entries: readable, and distinct for
+    # documents with the same name in different folders
+    digest = hashlib.sha256(os.path.abspath(source).encode('utf-8')).hexdigest()
+    return f"{os.path.splitext(os.path.basename(source))[0]}-{digest[:12]}"
+
+class SectionCache:
+    # Persistent per-section cache of rendered (html, md) body fragments.
+    # Entries live in one small JSON file per section, named after a content
+    # hash of the section, so a build only loads the sections it reuses.
+    # With a scope (the source document), entries go in a subfolder of
+    # their own and evict() leaves other documents' entries alone, so
+    # several documents can share one cache_dir.
+    def __init__(self, cache_dir='.build_cache', scope=None):
+        self.cache_dir = cache_dir
+        self.scope_dir = os.path.join(cache_dir, scope_name(scope)) if scope is not None else cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._salt = f"{CACHE_VERSION}:{_renderer_fingerprint()}"
+        os.makedirs(self.scope_dir, exist_ok=True)
+
+    def key(self, section):
+        h = hashlib.sha256(self._salt.encode('utf-8'))
+        if section.heading is not None:
+            h.update(f"H{section.level}\0{section.heading.text}\0".encode('utf-8'))
+        for block in section.blocks:
+            h.update(type(block).__name__.encode('utf-8'))
+            h.update(repr(tuple(block)).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.scope_dir, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['html'], entry['md']
+
+    def put(self, key, html, md):
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'html': html, 'md': md}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self, live_keys):
+        # Drop entries for sections that no longer exist in the document;
+        # only this scope's folder is looked at
+        removed = 0
+        for name in os.listdir(self.scope_dir):
+            key, ext = os.path.splitext(name)
+            if ext == '.json' and key not in live_keys:
+                os.remove(os.path.join(self.scope_dir, name))
+                removed += 1
+        return removed
+
+class MemorySectionCache(SectionCache):
+    # Same interface, kept in a dict: for long-running processes (watch
+    # mode) that rebuild the same document over and over
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._salt = f"{CACHE_VERSION}:{_renderer_fingerprint()}"
+        self._entries = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, html, md):
+        self._entries[key] = (html, md)
+
+    def evict(self, live_keys):
+        stale = [key for key in self._entries if key not in live_keys]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
@@ -0,0 +1,129 @@
+import os
+import posixpath
+import struct
+import xml.etree.ElementTree as ET
+
+REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+IMAGE_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+CHUNK_SIZE = 1 << 16
+# Office lengths are in EMU; 914400 per inch, 96 px per inch
+EMU_PER_PIXEL = 9525
+
+def load_image_rels(zf, part='word/document.xml'):
+    # Map relationship id -> zip member for the images a part embeds
+    folder, name = posixpath.split(part)
+    try:
+        xml_file = zf.open(f"{folder}/_rels/{name}.rels")
+    except KeyError:
+        return {}
+    rels = {}
+    with xml_file:
+        for _, elem in ET.iterparse(xml_file):
+            if (elem.tag == f'{{{REL_NS}}}Relationship' and elem.get('Type') == IMAGE_REL_TYPE
+                    and elem.get('TargetMode') != 'External'):
+                rels[elem.get('Id')] = posixpath.normpath(posixpath.join(folder, elem.get('Target')))
+    return rels
+
+# --- Image headers ---------------------------------------------------------
+# Only as many bytes as the format needs are read: a fixed header for PNG,
+# GIF, BMP and WebP, the marker chain up to the first SOF for JPEG.
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while marker and marker[0] != 0xFF:
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0x01, 0xD8) or 0xD0 <= code <= 0xD7:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack('>H', length)
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+def image_size(path):
+    # (width, height) in pixels from the file header, or None
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head.startswith(b'BM') and len(head) >= 26:
+            width, height = struct.unpack('<ii', head[18:26])
+            return width, abs(height)
+        if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', head[26:30] if len(head) >= 30 else head[26:] + f.read(4))
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b'VP8L':
+                b = head[21:25]
+                return 1 + (((b[1] & 0x3F) << 8) | b[0]), 1 + (((b[3] & 0xF) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            if chunk == b'VP8X':
+                b = head[24:30]
+                return 1 + int.from_bytes(b[:3], 'little'), 1 + int.from_bytes(b[3:], 'little')
+        if head.startswith(b'\xff\xd8'):
+            return _jpeg_size(f)
+    return None
+
+# --- Extraction ------------------------------------------------------------
+
+class MediaExtractor:
+    # Copies images out of the .docx into assets_dir as they are referenced.
+    # Files are named after their CRC32 and size from the zip directory, so
+    # an image already extracted (earlier in this document, from another
+    # document, or by a previous build) is recognized without reading it.
+    def __init__(self, assets_dir, url_prefix=None):
+        self.assets_dir = assets_dir
+        self.url_prefix = url_prefix if url_prefix is not None else os.path.basename(assets_dir)
+        self.extracted = 0
+        self.skipped = 0
+        self._done = {}
+
+    def extract(self, zf, member):
+        # -> (url, width, height); width/height are None for unknown formats
+        info = zf.getinfo(member)
+        key = (info.CRC, info.file_size)
+        if key in self._done:
+            self.skipped += 1
+            return self._done[key]
+
+        ext = posixpath.splitext(member)[1].lower()
+        name = f"{info.CRC:08x}-{info.file_size}{ext}"
+        path = os.path.join(self.assets_dir, name)
+        if os.path.exists(path) and os.path.getsize(path) == info.file_size:
+            self.skipped += 1
+        else:
+            os.makedirs(self.assets_dir, exist_ok=True)
+            with zf.open(info) as src, open(path + '.tmp', 'wb') as dst:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            os.replace(path + '.tmp', path)
+            self.extracted += 1
+
+        size = image_size(path) or (None, None)
+        result = (posixpath.join(self.url_prefix, name) if self.url_prefix else name,) + tuple(size)
+        self._done[key] = result
+        return result
+
+def media_dir_for(output_html):
+    # processed_journey.html -> processed_journey_media/
+    return os.path.splitext(output_html)[0] + '_media'
@@ -0,0 +1,277 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from extract_docx import Table, iter_paragraphs
+from process_text import heading_level, list_item
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+# One typed row per list item and per table body row of a document.
+# block is the record's index in the paragraph stream and row the body row
+# of a table (0 for list items); together with source they identify the
+# row. label is the item text, or the first cell of a table row, up to an
+# '='; value and unit are the number after it ("نشاط حضر فيه = +6 نقاط"
+# -> 'نشاط حضر فيه', 6.0, 'نقاط'), or the first numeric cell of a table
+# row. cells maps the table header to the row's cells.
+ExportRow = namedtuple('ExportRow', ['source', 'block', 'row', 'kind', 'section', 'item_level',
+                                     'label', 'value', 'unit', 'cells'])
+
+COLUMNS = ExportRow._fields
+DEFAULT_TABLE = 'evaluation_criteria'
+DEFAULT_BATCH_SIZE = 1000
+
+# Portable enough for SQLite and Postgres
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS {table} (
+  source TEXT NOT NULL,
+  block INTEGER NOT NULL,
+  row INTEGER NOT NULL,
+  kind TEXT NOT NULL,
+  section TEXT,
+  item_level INTEGER,
+  label TEXT NOT NULL,
+  value NUMERIC,
+  unit TEXT,
+  cells TEXT,
+  PRIMARY KEY (source, block, row)
+)"""
+
+DIGIT_FOLDS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹٫', '01234567890123456789.')
+VALUE_PATTERN = re.compile(r'([+-]?\d+(?:\.\d+)?)\s*(%|[^\W\d_]+)?')
+# Short unstyled lines pass the heading heuristic, worked examples too
+# ("الناتج:(70 × 70%) + (60 × 30%)= 67 نقطة"); those never name a section
+FORMULA_PATTERN = re.compile(r'[=\d]')
+
+def parse_value(text):
+    # (value, unit) of the first number in text, or (None, None)
+    m = VALUE_PATTERN.search(text.translate(DIGIT_FOLDS))
+    if m is None:
+        return None, None
+    return float(m.group(1)), m.group(2)
+
+def split_label(text):
+    # "label = value unit" -> (label, value, unit)
+    label, sep, rest = text.rpartition('=')
+    if not sep:
+        return text.strip(), None, None
+    value, unit = parse_value(rest)
+    if value is None:
+        return text.strip(), None, None
+    return label.strip(), value, unit
+
+def iter_rows(paragraphs, source):
+    # One pass over the paragraph stream; only the current section title
+    # is kept between records
+    section = None
+    for block, record in enumerate(paragraphs):
+        if isinstance(record, Table):
+            header, body = record.rows[0], record.rows[1:]
+            for row, cells in enumerate(body, 1):
+                label, value, unit = split_label(cells[0] if cells else '')
+                if value is None:
+                    for cell in cells[1:]:
+                        value, unit = parse_value(cell)
+                        if value is not None:
+                            break
+                named = {header[i] if i < len(header) and header[i] else f"column_{i + 1}": cell
+                         for i, cell in enumerate(cells)}
+                yield ExportRow(source, block, row, 'table', section, None, label, value, unit, named)
+            continue
+        if not record.text:
+            continue
+        item = list_item(record)
+        if item is not None:
+            level, text = item
+            label, value, unit = split_label(text)
+            yield ExportRow(source, block, 0, 'list', section, level, label, value, unit, None)
+        elif block == 0 or is_section(record):
+            section = record.text
+
+def is_section(record):
+    # Styled headings always start a section; guessed ones only when they
+    # read like a title rather than a formula or a figure
+    if not heading_level(record):
+        return False
+    return record.style is not None or not FORMULA_PATTERN.search(record.text)
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# --- Files -----------------------------------------------------------------
+
+def _flat(row):
+    # CSV has no nesting: cells goes out as a JSON object
+    values = list(row)
+    if row.cells is not None:
+        values[-1] = json.dumps(row.cells, ensure_ascii=False)
+    return values
+
+def write_csv_batch(batch, path):
+    # utf-8-sig so spreadsheet programs pick the encoding up
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(_flat(row) for row in batch)
+
+def write_jsonl_batch(batch, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in batch:
+            f.write(json.dumps(row._asdict(), ensure_ascii=False))
+            f.write('\n')
+
+BATCH_WRITERS = {'csv': write_csv_batch, 'jsonl': write_jsonl_batch}
+
+# --- Database --------------------------------------------------------------
+
+class ConnectionPool:
+    # Hands out a single connection, opened on first use and kept for every
+    # load after it. connect is any DB-API connect callable; paramstyle is
+    # that module's (sqlite3: 'qmark', psycopg2: 'pyformat').
+    def __init__(self, connect, paramstyle='qmark'):
+        self._connect = connect
+        self.placeholder = '?' if paramstyle == 'qmark' else '%s'
+        self._conn = None
+
+    @contextmanager
+    def connection(self):
+        # One transaction: committed when the block succeeds
+        if self._conn is None:
+            self._conn = self._connect()
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def open_pool(database):
+    # postgres://... or postgresql://... needs psycopg2; anything else is a
+    # SQLite file (':memory:' works too)
+    if database.startswith(('postgres://', 'postgresql://')):
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 is not installed (pip install psycopg2-binary)")
+        return ConnectionPool(lambda: psycopg2.connect(database), psycopg2.paramstyle)
+    return ConnectionPool(lambda: sqlite3.connect(database), sqlite3.paramstyle)
+
+class BatchLoader:
+    # Inserts batches of ExportRows with one multi-row INSERT each, so a
+    # batch costs one round-trip whatever the driver's executemany does.
+    # Rows of a source are replaced, not duplicated, when it is loaded again.
+    def __init__(self, pool, table=DEFAULT_TABLE, create=True):
+        self.pool = pool
+        self.table = table
+        self.create = create
+        self.statements = 0
+        self.rows = 0
+        self._cleared = set()
+        self._insert_sql = {}
+
+    def start(self):
+        # A new load: sources met from here on replace their stored rows
+        self._cleared = set()
+
+    def _insert(self, size):
+        sql = self._insert_sql.get(size)
+        if sql is None:
+            values = '(' + ', '.join([self.pool.placeholder] * len(COLUMNS)) + ')'
+            sql = f"INSERT INTO {self.table} ({', '.join(COLUMNS)}) VALUES " + ', '.join([values] * size)
+            self._insert_sql[size] = sql
+        return sql
+
+    def load(self, batch):
+        params = []
+        for row in batch:
+            params.extend(_flat(row))
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            if self.create:
+                cur.execute(CREATE_TABLE.format(table=self.table))
+                self.create = False
+                self.statements += 1
+            for source in {row.source for row in batch} - self._cleared:
+                cur.execute(f"DELETE FROM {self.table} WHERE source = {self.pool.placeholder}", (source,))
+                self._cleared.add(source)
+                self.statements += 1
+            cur.execute(self._insert(len(batch)), params)
+            cur.close()
+        self.statements += 1
+        self.rows += len(batch)
+
+# --- Export ----------------------------------------------------------------
+
+def export(docx_paths, output_dir=None, formats=('csv', 'jsonl'), batch_size=DEFAULT_BATCH_SIZE, loader=None):
+    # Streams every document's rows once: each batch is written to
+    # rows-NNNN.<format> in output_dir and/or handed to the loader
+    files = []
+    total = 0
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        # Batches of an earlier, longer export would otherwise linger
+        for name in os.listdir(output_dir):
+            if name.startswith('rows-') and name.rsplit('.', 1)[-1] in BATCH_WRITERS:
+                os.remove(os.path.join(output_dir, name))
+    if loader is not None:
+        loader.start()
+    rows = (row for path in docx_paths
+            for row in iter_rows(iter_paragraphs(path), os.path.basename(path)))
+    for n, batch in enumerate(batched(rows, batch_size), 1):
+        if output_dir:
+            for fmt in formats:
+                path = os.path.join(output_dir, f"rows-{n:04d}.{fmt}")
+                BATCH_WRITERS[fmt](batch, path)
+                files.append(path)
+        if loader is not None:
+            loader.load(batch)
+        total += len(batch)
+    return total, files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the tables and lists of .docx files as typed rows")
+    parser.add_argument('sources', nargs='*', default=["المقترح_العملي_لنظام_التقييم-2.docx"])
+    parser.add_argument('-o', '--output-dir', default='export', help="folder for the CSV/JSONL batches")
+    parser.add_argument('--format', default='csv,jsonl', help="comma-separated: csv, jsonl")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per file and per INSERT")
+    parser.add_argument('--database', help="also load the rows: a SQLite file or a postgres:// URL")
+    parser.add_argument('--table', default=DEFAULT_TABLE)
+    args = parser.parse_args()
+
+    formats = [fmt for fmt in args.format.split(',') if fmt]
+    unknown = [fmt for fmt in formats if fmt not in BATCH_WRITERS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    pool = loader = None
+    if args.database:
+        pool = open_pool(args.database)
+        loader = BatchLoader(pool, args.table)
+    started = time.perf_counter()
+    try:
+        total, files = export(args.sources, args.output_dir, formats, args.batch_size, loader)
+    finally:
+        if pool is not None:
+            pool.close()
+    print(f"Exported {total} rows to {len(files)} files in {args.output_dir}"
+          f" ({time.perf_counter() - started:.3f}s)")
+    if loader is not None:
+        print(f"Loaded {loader.rows} rows into {args.table} with {loader.statements} statements")
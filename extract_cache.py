@@ -0,0 +1,145 @@
+import hashlib
+import marshal
+import os
+import sys
+import zipfile
+import zlib
+
+import docx_media
+import extract_docx
+from extract_docx import Image, Paragraph, Table, iter_paragraphs
+
+# Bump when the record encoding changes
+CACHE_VERSION = 1
+
+# Parts whose content decides the extracted records, plus every picture
+# under MEDIA_PREFIX: a picture replaced under the same name changes the
+# extracted file and its dimensions. CRC32 and size come from the zip
+# central directory, so checking them does not decompress anything.
+CONTENT_PARTS = ('word/document.xml', 'word/styles.xml', 'word/_rels/document.xml.rels')
+MEDIA_PREFIX = 'word/media/'
+
+def content_key(docx_path):
+    with zipfile.ZipFile(docx_path) as zf:
+        key = []
+        for name in CONTENT_PARTS:
+            try:
+                info = zf.getinfo(name)
+            except KeyError:
+                key.append(None)
+                continue
+            key.append((info.CRC, info.file_size))
+        key.extend(sorted((info.filename, info.CRC, info.file_size) for info in zf.infolist()
+                          if info.filename.startswith(MEDIA_PREFIX)))
+        return tuple(key)
+
+def _extractor_fingerprint():
+    # Cached records are only valid for the extractor that produced them
+    h = hashlib.sha256()
+    for module in (extract_docx, docx_media):
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+# Records are stored as plain tuples, written with marshal and deflated:
+# both loaders are C code, so a cached document comes back in one read,
+# one decompress() and one loads() call, at about a tenth of the size of
+# the raw records. marshal's format may change between Python versions,
+# hence the cache tag in the key.
+
+def _encode(record):
+    if isinstance(record, Table):
+        return ('T', record.rows)
+    if isinstance(record, Image):
+        return ('I',) + tuple(record)
+    return ('P',) + tuple(record)
+
+def _decode(item):
+    kind = item[0]
+    if kind == 'T':
+        return Table(item[1])
+    if kind == 'I':
+        return Image(*item[1:])
+    return Paragraph(*item[1:])
+
+class ExtractionCache:
+    # Persistent cache of extracted paragraph records, one file per document
+    # version. Reading a hit costs the zip directory plus one file; the
+    # folder is kept under max_bytes by evicting the least recently used
+    # entries (last use is the file's mtime, refreshed on every hit).
+    def __init__(self, cache_dir='.extract_cache', max_bytes=64 << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._salt = f"{CACHE_VERSION}:{sys.implementation.cache_tag}:{_extractor_fingerprint()}"
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, docx_path, media=None):
+        # Image sources depend on where the media folder is served from
+        prefix = media.url_prefix if media is not None else None
+        h = hashlib.sha256(f"{self._salt}:{content_key(docx_path)!r}:{prefix!r}".encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def load(self, key, media=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                items = marshal.loads(zlib.decompress(f.read()))
+        except (OSError, EOFError, ValueError, TypeError, zlib.error):
+            self.misses += 1
+            return None
+        records = [_decode(item) for item in items]
+        if media is not None:
+            # A hit is only good if the pictures it points at are still there
+            images = [r for r in records if isinstance(r, Image)]
+            if not all(os.path.exists(os.path.join(media.assets_dir, os.path.basename(r.src)))
+                       for r in images):
+                self.misses += 1
+                return None
+            media.skipped += len(images)
+        os.utime(path)
+        self.hits += 1
+        return records
+
+    def store(self, key, records):
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(zlib.compress(marshal.dumps([_encode(record) for record in records])))
+        os.replace(tmp_path, path)
+        self.trim()
+
+    def trim(self):
+        # Evict least recently used entries until the folder fits max_bytes
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.bin'):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime_ns, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            removed += 1
+        return removed
+
+    def paragraphs(self, docx_path, media=None):
+        # Drop-in for extract_docx.iter_paragraphs. On a miss the document
+        # is streamed as usual and stored once it has been read to the end.
+        key = self.key(docx_path, media)
+        records = self.load(key, media)
+        if records is not None:
+            yield from records
+            return
+        records = []
+        for record in iter_paragraphs(docx_path, media):
+            records.append(record)
+            yield record
+        self.store(key, records)
@@ -1,43 +1,273 @@
 import zipfile
 import xml.etree.ElementTree as ET
+import re
 import sys
 import os
+from collections import namedtuple
+
+from docx_media import EMU_PER_PIXEL, load_image_rels
+from instrument import stage
+
+# Namespaces in docx XML
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_T = f'{{{W_NS}}}t'
+W_PPR = f'{{{W_NS}}}pPr'
+W_PSTYLE = f'{{{W_NS}}}pStyle'
+W_OUTLINE = f'{{{W_NS}}}outlineLvl'
+W_NUMPR = f'{{{W_NS}}}numPr'
+W_ILVL = f'{{{W_NS}}}ilvl'
+W_STYLE = f'{{{W_NS}}}style'
+W_NAME = f'{{{W_NS}}}name'
+W_BASED_ON = f'{{{W_NS}}}basedOn'
+W_VAL = f'{{{W_NS}}}val'
+W_TYPE = f'{{{W_NS}}}type'
+W_STYLE_ID = f'{{{W_NS}}}styleId'
+W_TBL = f'{{{W_NS}}}tbl'
+W_TR = f'{{{W_NS}}}tr'
+W_TC = f'{{{W_NS}}}tc'
+WP_NS = 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'
+WP_INLINE = f'{{{WP_NS}}}inline'
+WP_ANCHOR = f'{{{WP_NS}}}anchor'
+WP_EXTENT = f'{{{WP_NS}}}extent'
+WP_DOCPR = f'{{{WP_NS}}}docPr'
+A_BLIP = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+R_EMBED = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+
+# One record per paragraph. style is the paragraph style name as declared in
+# styles.xml ("heading 1", "Title", "List Paragraph"...), or None when the
+# paragraph has no w:pStyle (or comes from a plain text file).
+# outline_level is 0 for a Heading 1, 1 for a Heading 2, etc.
+# list_level is the numbering level (w:ilvl) for list items, else None.
+Paragraph = namedtuple('Paragraph', ['text', 'style', 'outline_level', 'list_level'],
+                       defaults=(None, None, None))
+
+class Table(namedtuple('Table', ['rows'])):
+    # One record per top-level w:tbl. rows is a list of rows, each a list
+    # of cell texts (a cell's paragraphs joined with '\n'). Tables nested
+    # in a cell are flattened into that cell's text.
+    __slots__ = ()
+
+    @property
+    def text(self):
+        # Plain-text view: one line per cell paragraph, as extraction
+        # produced before tables were recognized
+        return '\n'.join(cell for row in self.rows for cell in row if cell)
+
+class Image(namedtuple('Image', ['src', 'width', 'height', 'alt'])):
+    # One record per picture (w:drawing) in a body paragraph, yielded right
+    # after that paragraph when iter_paragraphs is given a MediaExtractor.
+    # src is relative to the HTML output; width/height are the image's own
+    # pixel size, or its displayed size when the header was not readable.
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return ''
+
+HEADING_STYLE_PATTERN = re.compile(r'^heading (\d)$', re.IGNORECASE)
+
+def _int_val(elem):
+    if elem is None:
+        return None
+    try:
+        return int(elem.get(W_VAL))
+    except (TypeError, ValueError):
+        return None
+
+def load_styles(zf):
+    # Map styleId -> (name, outline_level, is_list) for paragraph styles.
+    # Word localizes style ids ("Titre1" for "heading 1" in French), so the
+    # name and outline level are what we can rely on.
+    try:
+        xml_file = zf.open('word/styles.xml')
+    except KeyError:
+        return {}
+
+    raw = {}
+    with xml_file:
+        for event, elem in ET.iterparse(xml_file):
+            if elem.tag != W_STYLE:
+                continue
+            if elem.get(W_TYPE) == 'paragraph':
+                style_id = elem.get(W_STYLE_ID)
+                name_elem = elem.find(W_NAME)
+                name = name_elem.get(W_VAL) if name_elem is not None else style_id
+                based_on = elem.find(W_BASED_ON)
+                outline_level = None
+                is_list = False
+                ppr = elem.find(W_PPR)
+                if ppr is not None:
+                    outline_level = _int_val(ppr.find(W_OUTLINE))
+                    is_list = ppr.find(W_NUMPR) is not None
+                if outline_level is None:
+                    match = HEADING_STYLE_PATTERN.match(name or '')
+                    if match:
+                        outline_level = int(match.group(1)) - 1
+                raw[style_id] = (name, outline_level, is_list,
+                                 based_on.get(W_VAL) if based_on is not None else None)
+            elem.clear()
+
+    styles = {}
+    for style_id, (name, outline_level, is_list, parent) in raw.items():
+        # Inherit outline level and list numbering through basedOn
+        seen = {style_id}
+        while parent in raw and parent not in seen and (outline_level is None or not is_list):
+            seen.add(parent)
+            _, parent_outline, parent_list, next_parent = raw[parent]
+            if outline_level is None:
+                outline_level = parent_outline
+            is_list = is_list or parent_list
+            parent = next_parent
+        # outlineLvl 9 means "body text", and it still stops inheritance
+        if outline_level is not None and outline_level >= 9:
+            outline_level = None
+        styles[style_id] = (name, outline_level, is_list)
+    return styles
+
+def _paragraph_record(p, styles):
+    paragraph_text = [t.text for t in p.iter(W_T) if t.text]
+    if not paragraph_text:
+        return None
+
+    style = None
+    outline_level = None
+    list_level = None
+    ppr = p.find(W_PPR)
+    if ppr is not None:
+        style_elem = ppr.find(W_PSTYLE)
+        if style_elem is not None:
+            style_id = style_elem.get(W_VAL)
+            name, outline_level, is_list = styles.get(style_id, (style_id, None, False))
+            style = name
+            if is_list:
+                list_level = 0
+        direct_outline = _int_val(ppr.find(W_OUTLINE))
+        # outlineLvl 9 means "body text"
+        if direct_outline is not None:
+            outline_level = direct_outline if direct_outline < 9 else None
+        numpr = ppr.find(W_NUMPR)
+        if numpr is not None:
+            list_level = _int_val(numpr.find(W_ILVL)) or 0
+
+    return Paragraph(''.join(paragraph_text), style, outline_level, list_level)
+
+def _image_records(p, zf, rels, media):
+    for drawing in p.iter():
+        if drawing.tag not in (WP_INLINE, WP_ANCHOR):
+            continue
+        blip = next(drawing.iter(A_BLIP), None)
+        member = rels.get(blip.get(R_EMBED)) if blip is not None else None
+        if member is None or member not in zf.NameToInfo:
+            continue
+        src, width, height = media.extract(zf, member)
+        if width is None:
+            extent = drawing.find(WP_EXTENT)
+            if extent is not None:
+                width = round(int(extent.get('cx', 0)) / EMU_PER_PIXEL) or None
+                height = round(int(extent.get('cy', 0)) / EMU_PER_PIXEL) or None
+        docpr = drawing.find(WP_DOCPR)
+        alt = (docpr.get('descr') or docpr.get('title') or '') if docpr is not None else ''
+        yield Image(src, width, height, alt)
+
+def iter_paragraphs(docx_path, media=None):
+    # Stream word/document.xml straight out of the zip instead of reading
+    # it whole, and yield a Paragraph record as soon as each w:p is closed
+    # and a Table record as soon as each top-level w:tbl is. With a
+    # docx_media.MediaExtractor, pictures are copied out as they are met
+    # and an Image record follows the paragraph that holds each one.
+    with zipfile.ZipFile(docx_path) as zf:
+        styles = load_styles(zf)
+        rels = load_image_rels(zf) if media is not None else {}
+        with zf.open('word/document.xml') as xml_file:
+            depth = 0
+            body = None
+            # Open tables, innermost last: [rows, current row, current cell]
+            tables = []
+            for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    depth += 1
+                    # document > body: keep a handle so handled children can be dropped
+                    if depth == 2:
+                        body = elem
+                    elif tag == W_TBL:
+                        tables.append([[], None, None])
+                    elif tables and tag == W_TR:
+                        tables[-1][1] = []
+                    elif tables and tag == W_TC:
+                        tables[-1][2] = []
+                    continue
+
+                depth -= 1
+                if tag == W_P:
+                    record = _paragraph_record(elem, styles)
+                    if record is not None:
+                        if tables and tables[-1][2] is not None:
+                            tables[-1][2].append(record.text)
+                        elif not tables:
+                            yield record
+                    if rels and not tables:
+                        yield from _image_records(elem, zf, rels, media)
+                    elem.clear()
+                elif tables:
+                    table = tables[-1]
+                    if tag == W_TC and table[1] is not None:
+                        table[1].append('\n'.join(table[2] or ()))
+                        table[2] = None
+                    elif tag == W_TR and table[1] is not None:
+                        table[0].append(table[1])
+                        table[1] = None
+                    elif tag == W_TBL:
+                        tables.pop()
+                        record = Table(table[0])
+                        if tables and tables[-1][2] is not None:
+                            tables[-1][2].extend(line for line in record.text.split('\n') if line)
+                        elif not tables and record.rows:
+                            yield record
+                    if tag in (W_TC, W_TR, W_TBL):
+                        elem.clear()
+
+                # Detach finished top-level blocks so the tree never grows
+                if depth == 2 and body is not None:
+                    body.remove(elem)
 
 def extract_text_from_docx(docx_path):
     try:
-        with zipfile.ZipFile(docx_path) as zf:
-            xml_content = zf.read('word/document.xml')
-        
-        tree = ET.fromstring(xml_content)
-        
-        # Namespaces in docx XML
-        namespaces = {
-            'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
-        }
-        
-        text_parts = []
-        for p in tree.findall('.//w:p', namespaces):
-            paragraph_text = []
-            for t in p.findall('.//w:t', namespaces):
-                if t.text:
-                    paragraph_text.append(t.text)
-            if paragraph_text:
-                text_parts.append(''.join(paragraph_text))
-        
-        return '\n'.join(text_parts)
+        return '\n'.join(p.text for p in iter_paragraphs(docx_path))
     except Exception as e:
         return f"Error: {str(e)}"
 
 if __name__ == "__main__":
-    filename = "رحلة الحج إلى الجنان.docx"
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract the text of a .docx to extracted_content.txt")
+    parser.add_argument('filename', nargs='?', default="رحلة الحج إلى الجنان.docx")
+    parser.add_argument('--cache-dir', default='.extract_cache',
+                        help="reuse the records of an unchanged document from this cache")
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+    filename = args.filename
     if not os.path.exists(filename):
         print(f"File not found: {filename}")
         sys.exit(1)
-        
-    content = extract_text_from_docx(filename)
-    
-    # Write to a text file to be read by the agent
-    with open("extracted_content.txt", "w", encoding="utf-8") as f:
-        f.write(content)
-    
-    print("Extraction complete. Content saved to extracted_content.txt")
+
+    paragraphs = iter_paragraphs(filename)
+    cache = None
+    if not args.no_cache:
+        from extract_cache import ExtractionCache
+        cache = ExtractionCache(args.cache_dir)
+        paragraphs = cache.paragraphs(filename)
+
+    # Write paragraphs as they are extracted to be read by the agent
+    with stage('extract_docx') as s, open("extracted_content.txt", "w", encoding="utf-8") as f:
+        s.read(filename)
+        s.wrote("extracted_content.txt")
+        for i, paragraph in enumerate(s.counted(paragraphs, 'paragraphs')):
+            if i:
+                f.write('\n')
+            f.write(paragraph.text)
+        if cache is not None:
+            s.count('cache_hits', cache.hits)
+
+    print("Extraction complete. Content saved to extracted_content.txt"
+          + (" (from cache)" if cache is not None and cache.hits else ""))
@@ -1,4 +1,16 @@
+import sys
+
+from heading_index import fresh_index
+
 def find_bullet_heading(file_path):
+    # Answer from the pipeline's sidecar index when there is an up-to-date one
+    index = fresh_index(file_path)
+    if index is not None:
+        for entry in index['headings']:
+            if '•' in entry['title']:
+                print(f"Found bullet heading at line {entry['line']}: {'#' * entry['level']} {entry['title']}")
+        return
+
     with open(file_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
@@ -8,4 +20,4 @@ def find_bullet_heading(file_path):
              print(f"Found bullet heading at line {i+1}: {line.strip()}")
 
 if __name__ == "__main__":
-    find_bullet_heading(r"c:\Antigravity\processed_journey.md")
+    find_bullet_heading(sys.argv[1] if len(sys.argv) > 1 else "processed_journey.md")
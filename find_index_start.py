@@ -1,4 +1,20 @@
+import sys
+
+from heading_index import fresh_index
+
+INDEX_MARKERS = ['دليل الكتاب', 'الفتنة الكبرى1']
+
 def find_index_start(file_path):
+    # Answer from the pipeline's sidecar index when there is an up-to-date one
+    index = fresh_index(file_path)
+    if index is not None:
+        for entry in index['headings']:
+            for marker in INDEX_MARKERS:
+                if marker in entry['title']:
+                    print(f"Found '{marker}' at line {entry['line']}")
+                    return
+        return
+
     with open(file_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
@@ -12,4 +28,4 @@ def find_index_start(file_path):
              return
 
 if __name__ == "__main__":
-    find_index_start(r"c:\Antigravity\processed_journey.md")
+    find_index_start(sys.argv[1] if len(sys.argv) > 1 else "processed_journey.md")
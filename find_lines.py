@@ -1,12 +1,21 @@
+import sys
+
+from search_text import MultiSearch
+
 def find_lines(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    for i, line in enumerate(lines):
-        if 'دليل الكتاب' in line:
-            print(f"Found 'دليل الكتاب' at line {i+1}: {line.strip()}")
-        if line.strip().startswith('##') and '•' in line:
-            print(f"Found bullet heading at line {i+1}: {line.strip()}")
+    # Both checks in one search over the file. Only blanks may precede the
+    # '##': \s would also match newlines and start on a line above it.
+    search = MultiSearch(literals=['دليل الكتاب'], regexes=[r'^[ \t]*##.*•'])
+    seen = set()
+    for m in search.search_file(file_path):
+        # Report each line once per check, like the old line scan
+        if (m.pattern, m.line) in seen:
+            continue
+        seen.add((m.pattern, m.line))
+        if m.pattern == 'دليل الكتاب':
+            print(f"Found 'دليل الكتاب' at line {m.line}: {m.text}")
+        else:
+            print(f"Found bullet heading at line {m.line}: {m.text}")
 
 if __name__ == "__main__":
-    find_lines(r"c:\Antigravity\processed_journey.md")
+    find_lines(sys.argv[1] if len(sys.argv) > 1 else "processed_journey.md")
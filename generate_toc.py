@@ -1,50 +1,159 @@
 import re
+import sys
+import unicodedata
 
-def generate_toc(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    toc_lines = []
-    toc_lines.append("## فهرس المحتويات\n\n")
-    
-    # Regex to capture headings
-    heading_pattern = re.compile(r'^(##+)\s+(.*)')
-    
+from heading_index import discard_index
+from instrument import stage
+
+TOC_TITLE = "فهرس المحتويات"
+
+def slugify(title):
+    # GitHub-style anchor: lowercase, spaces to hyphens, punctuation dropped.
+    # Letters, combining marks and digits are kept, so fully vocalized
+    # Arabic keeps its harakat and the anchor matches the rendered heading.
+    slug = []
+    for ch in title.strip().lower():
+        if ch == ' ':
+            slug.append('-')
+        elif ch in '-_' or unicodedata.category(ch)[0] in 'LMN':
+            slug.append(ch)
+    return ''.join(slug)
+
+class HeadingRegistry:
+    # Collects headings as they are rendered and hands out their anchors.
+    # Anchors come from the heading text, so they only change when that
+    # heading does; repeats get -1, -2... as on GitHub. Both TOCs are
+    # produced from the registry without another look at the document.
+    def __init__(self, reserved=(TOC_TITLE,)):
+        self.entries = []
+        self._used = {slugify(title) for title in reserved}
+
+    def add(self, level, title):
+        base = slugify(title) or f"section-{len(self.entries) + 1}"
+        anchor = base
+        n = 0
+        while anchor in self._used:
+            n += 1
+            anchor = f"{base}-{n}"
+        self._used.add(anchor)
+        self.entries.append((level, title, anchor))
+        return anchor
+
+    def anchors(self):
+        return [anchor for _, _, anchor in self.entries]
+
+    def toc_html(self):
+        return f'<div class="toc"><h2>{TOC_TITLE}</h2>{render_toc_list(self.entries)}</div>'
+
+    def toc_md_lines(self):
+        return build_toc_lines(self.entries)
+
+def toc_depths(levels):
+    # Nesting depth of each entry: one step deeper per increase in level,
+    # whatever its size, back out to the matching ancestor on a decrease
+    stack = []
+    depths = []
+    for level in levels:
+        while len(stack) > 1 and level <= stack[-2]:
+            stack.pop()
+        if not stack:
+            stack.append(level)
+        elif level > stack[-1]:
+            stack.append(level)
+        else:
+            stack[-1] = level
+        depths.append(len(stack) - 1)
+    return depths
+
+def render_toc_list(entries):
+    # entries: (level, title, anchor). Nested <ul>s; a flat list renders as
+    # a single <ul> of <li><a>...</a></li>.
+    parts = ['<ul>']
+    depth = -1
+    for (_, title, anchor), entry_depth in zip(entries, toc_depths(level for level, _, _ in entries)):
+        if entry_depth > depth >= 0:
+            parts.append('<ul>')
+        else:
+            if depth >= 0:
+                parts.append('</li>')
+            parts.extend('</ul></li>' for _ in range(depth - entry_depth))
+        parts.append(f'<li><a href="#{anchor}">{title}</a>')
+        depth = entry_depth
+    if depth >= 0:
+        parts.append('</li>')
+        parts.extend('</ul></li>' for _ in range(depth))
+    parts.append('</ul>')
+    return ''.join(parts)
+
+TOC_TOKEN_PATTERN = re.compile(r'<ul>|</ul>|<li><a href="#([^"]+)">(.*?)</a>', re.DOTALL)
+
+def parse_toc_list(html):
+    # Inverse of render_toc_list: (depth, title, anchor) for each entry
+    entries = []
+    depth = -1
+    for m in TOC_TOKEN_PATTERN.finditer(html):
+        token = m.group(0)
+        if token == '<ul>':
+            depth += 1
+        elif token == '</ul>':
+            depth -= 1
+        else:
+            entries.append((depth, m.group(2), m.group(1)))
+    return entries
+
+def build_toc_lines(entries):
+    # entries: (level, title, anchor), as collected by HeadingRegistry
+    toc_lines = [f"## {TOC_TITLE}\n\n"]
+    for (_, title, anchor), depth in zip(entries, toc_depths(level for level, _, _ in entries)):
+        toc_lines.append(f"{'  ' * depth}- [{title}](#{anchor})\n")
+    return toc_lines
+
+HEADING_PATTERN = re.compile(r'^(##+)\s+(.*)')
+TOC_LINE_PATTERN = re.compile(r'^\s*- \[.*\]\(#[^)]*\)\s*$')
+
+def regenerate_toc(lines):
+    # Replace the TOC of a Markdown document (as a list of lines) in one
+    # walk: the old TOC block is dropped, headings are registered as they
+    # go by, and the new TOC is inserted after the "# " title line
+    output = []
+    registry = HeadingRegistry()
+    insert_index = None
+    in_toc = False
     for line in lines:
-        match = heading_pattern.match(line)
+        if in_toc:
+            if not line.strip() or TOC_LINE_PATTERN.match(line):
+                continue
+            in_toc = False
+        match = HEADING_PATTERN.match(line)
         if match:
-            level = len(match.group(1))
             title = match.group(2).strip()
-            # Create a simple anchor (this might need adjustment based on the specific markdown renderer)
-            # For now, we will just list them. If we want links, we need to know the slugification rule.
-            # Let's try to create a link assuming GitHub style: lowercase, spaces to hyphens, remove punctuation
-            slug = title.lower().replace(' ', '-')
-            slug = re.sub(r'[^\w\-]', '', slug) # Remove non-word chars (except hyphens) - might be too aggressive for Arabic
-            
-            # Actually, for Arabic, it's often safer to just link to the text if the renderer supports it, 
-            # or just provide the list. 
-            # Let's try to make it a link but keep the text clean.
-            # A safer approach for a generic markdown is just the list.
-            # But the user wants a "professional" output.
-            # Let's try to generate standard markdown links.
-            
-            indent = '  ' * (level - 2)
-            toc_lines.append(f"{indent}- [{title}](#{slug})\n")
-
-    # Insert TOC after the first heading (Title)
-    # Assuming the first line is the title "# ..."
-    insert_index = 0
-    for i, line in enumerate(lines):
-        if line.startswith('# '):
-            insert_index = i + 1
-            break
-            
-    # Add some spacing
-    final_lines = lines[:insert_index] + ['\n'] + toc_lines + ['\n'] + lines[insert_index:]
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.writelines(final_lines)
+            if title == TOC_TITLE:
+                in_toc = True
+                continue
+            registry.add(len(match.group(1)), title)
+        elif insert_index is None and line.startswith('# '):
+            insert_index = len(output) + 1
+        output.append(line)
+
+    if insert_index is None:
+        insert_index = 0
+    # Keep a single blank line on each side of the TOC
+    while insert_index < len(output) and not output[insert_index].strip():
+        del output[insert_index]
+    toc = ['\n'] + registry.toc_md_lines() + ['\n']
+    return output[:insert_index] + toc + output[insert_index:], registry
+
+def generate_toc(file_path):
+    with stage('generate_toc') as s:
+        s.read(file_path)
+        s.wrote(file_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines, registry = regenerate_toc(f.readlines())
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        discard_index(file_path)
+        s.count('headings', len(registry.entries))
 
 if __name__ == "__main__":
-    generate_toc(r"c:\Antigravity\processed_journey.md")
+    generate_toc(sys.argv[1] if len(sys.argv) > 1 else "processed_journey.md")
     print("TOC generated and inserted.")
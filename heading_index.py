@@ -0,0 +1,142 @@
+import argparse
+import json
+import mmap
+import os
+
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+class CountingWriter:
+    # Wraps a text file opened with newline='' and keeps track of the byte
+    # offset and line number of everything written so far, so the index can
+    # be produced in the same pass as the output.
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        self.line = 1
+        self.headings = []
+
+    def write(self, s):
+        self.f.write(s)
+        self.offset += len(s.encode('utf-8'))
+        self.line += s.count('\n')
+
+    def write_heading(self, fragment, level, title, anchor, marker):
+        # marker is where the heading itself starts inside fragment
+        # ('<h' for HTML, '#' for Markdown)
+        start = fragment.index(marker)
+        prefix = fragment[:start]
+        self.headings.append({
+            'level': level,
+            'title': title,
+            'anchor': anchor,
+            'line': self.line + prefix.count('\n'),
+            'offset': self.offset + len(prefix.encode('utf-8')),
+        })
+        self.write(fragment)
+
+    def close_sections(self):
+        # Each section runs until the next heading; the last one until here
+        for entry, following in zip(self.headings, self.headings[1:]):
+            entry['end'] = following['offset']
+        if self.headings:
+            self.headings[-1]['end'] = self.offset
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+def write_index(path, writer):
+    index = {
+        'version': INDEX_VERSION,
+        'file': os.path.basename(path),
+        'size': os.path.getsize(path),
+        'headings': writer.headings,
+    }
+    tmp_path = index_path(path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path(path))
+
+class StaleIndexError(Exception):
+    pass
+
+def load_index(path):
+    with open(index_path(path), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    # Cheap staleness check: the file must still be the one we indexed
+    if index.get('version') != INDEX_VERSION or index.get('size') != os.path.getsize(path):
+        raise StaleIndexError(f"{index_path(path)} does not match {path}; rebuild with pipeline.py")
+    return index
+
+def fresh_index(path):
+    # The index, or None when there is none or it no longer matches path;
+    # callers then scan the file itself
+    try:
+        return load_index(path)
+    except FileNotFoundError:
+        return None
+    except StaleIndexError as e:
+        print(f"Ignoring stale index: {e}")
+        return None
+
+def discard_index(path):
+    # For tools that rewrite path in place: the offsets in its index would
+    # no longer be right
+    try:
+        os.remove(index_path(path))
+    except FileNotFoundError:
+        pass
+
+def list_headings(path):
+    return load_index(path)['headings']
+
+def find_headings(path, needle):
+    return [entry for entry in load_index(path)['headings'] if needle in entry['title']]
+
+def section_entry(path, n):
+    # Section N is the Nth heading, counting from 1
+    headings = load_index(path)['headings']
+    if not 1 <= n <= len(headings):
+        raise KeyError(f"section {n}")
+    return headings[n - 1]
+
+def section_range(path, n):
+    entry = section_entry(path, n)
+    return entry['offset'], entry['end']
+
+def read_section(path, n):
+    start, end = section_range(path, n)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[start:end].decode('utf-8')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the heading index written next to pipeline outputs")
+    parser.add_argument('file', help="processed_journey.md or .html")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="list headings")
+    find = sub.add_parser('find', help="find headings containing text")
+    find.add_argument('text')
+    section = sub.add_parser('section', help="byte range (and text) of section N")
+    section.add_argument('n', type=int)
+    section.add_argument('--text', action='store_true', help="print the section itself")
+    args = parser.parse_args()
+
+    try:
+        load_index(args.file)
+    except FileNotFoundError:
+        parser.exit(1, f"No index for {args.file}; build it with pipeline.py\n")
+    except StaleIndexError as e:
+        parser.exit(1, f"{e}\n")
+
+    if args.command == 'list':
+        for entry in list_headings(args.file):
+            print(f"Line {entry['line']}: {'#' * entry['level']} {entry['title']}")
+    elif args.command == 'find':
+        for entry in find_headings(args.file, args.text):
+            print(f"Found at line {entry['line']} (byte {entry['offset']}): {entry['title']}")
+    else:
+        entry = section_entry(args.file, args.n)
+        print(f"{entry['anchor']}: lines from {entry['line']}, bytes {entry['offset']}-{entry['end']}: {entry['title']}")
+        if args.text:
+            print(read_section(args.file, args.n))
@@ -0,0 +1,254 @@
+import os
+import re
+import shutil
+import tempfile
+from collections import deque, namedtuple
+
+from generate_toc import parse_toc_list, render_toc_list
+
+# --- Rule declarations -----------------------------------------------------
+# Rules are plain data. Select picks a block element (a p, a heading, a
+# table, a div...) by tag, class and inner text; the range rules act on
+# everything from the block matching start up to the block matching end.
+
+Select = namedtuple('Select', ['tag', 'cls', 'text', 'startswith', 'contains'],
+                    defaults=(None, None, None, None, None))
+
+# Replace start..end (both included) with replacement
+ReplaceRange = namedtuple('ReplaceRange', ['name', 'start', 'end', 'replacement'])
+# Drop start up to, but not including, end
+DropRange = namedtuple('DropRange', ['name', 'start', 'end'])
+# Remove entries of the selected TOC block (flat or nested) whose #target
+# is not an id that survives in the output
+PruneToc = namedtuple('PruneToc', ['name', 'select'])
+
+# --- Tokenizer -------------------------------------------------------------
+
+TAG_PATTERN = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>')
+ATTR_PATTERN = re.compile(r'([a-zA-Z_:-]+)\s*=\s*"([^"]*)"')
+ID_PATTERN = re.compile(r'<[a-zA-Z][^>]*\sid="([^"]+)"')
+
+BLOCK_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'table',
+              'blockquote', 'pre', 'div', 'figure', 'hr'}
+VOID_TAGS = {'hr', 'br', 'img', 'meta', 'link', 'input'}
+# Containers are passed through; their children are the blocks rules see
+CONTAINER_CLASSES = {'container'}
+RAW_TEXT_TAGS = {'style', 'script'}
+
+TOKEN_PATTERN = re.compile(r'<[^>]*>|[^<]+')
+
+def iter_tokens(f, chunk_size=1 << 16):
+    # Split a text stream into tags ('<...>') and text runs without reading
+    # it whole. Each chunk is scanned in place with one finditer; only a tag
+    # cut off by the end of the chunk is carried over to the next read. A
+    # text run that straddles two chunks comes out in two pieces, which is
+    # harmless.
+    tail = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            if tail:
+                yield tail
+            return
+        buffer = tail + chunk if tail else chunk
+        # Everything from the first '<' after the last '>' is an unfinished tag
+        cut = buffer.find('<', buffer.rfind('>') + 1)
+        if cut == -1:
+            cut = len(buffer)
+            tail = ''
+        else:
+            tail = buffer[cut:]
+        for m in TOKEN_PATTERN.finditer(buffer, 0, cut):
+            yield m.group(0)
+
+class Block:
+    __slots__ = ('tag', 'attrs', 'parts')
+
+    def __init__(self, tag, attrs, first):
+        self.tag = tag
+        self.attrs = attrs
+        self.parts = [first]
+
+    @property
+    def raw(self):
+        return ''.join(self.parts)
+
+    @property
+    def text(self):
+        return ''.join(part for part in self.parts if not part.startswith('<')).strip()
+
+def _parse_tag(token):
+    m = TAG_PATTERN.match(token)
+    if not m:
+        return None, None, None
+    closing, tag, rest = m.groups()
+    return bool(closing), tag.lower(), dict(ATTR_PATTERN.findall(rest))
+
+def iter_blocks(tokens):
+    # Group tokens into top-level block elements. Everything else (document
+    # head, container tags, whitespace between blocks) comes through as
+    # plain strings.
+    block = None
+    depth = 0
+    raw_text = None
+    for token in tokens:
+        if raw_text is not None:
+            # Inside <style>/<script>: pass through until the closing tag
+            if block is not None:
+                block.parts.append(token)
+            else:
+                yield token
+            if token.lower().startswith(f'</{raw_text}'):
+                raw_text = None
+            continue
+
+        if not token.startswith('<'):
+            if block is not None:
+                block.parts.append(token)
+            else:
+                yield token
+            continue
+
+        closing, tag, attrs = _parse_tag(token)
+        if tag in RAW_TEXT_TAGS and not closing:
+            raw_text = tag
+
+        if block is not None:
+            block.parts.append(token)
+            if tag == block.tag and tag not in VOID_TAGS and not token.endswith('/>'):
+                depth += -1 if closing else 1
+                if depth == 0:
+                    yield block
+                    block = None
+            continue
+
+        is_container = tag == 'div' and bool(CONTAINER_CLASSES & set(attrs.get('class', '').split()))
+        if tag in BLOCK_TAGS and not closing and not is_container:
+            block = Block(tag, attrs, token)
+            if tag in VOID_TAGS or token.endswith('/>'):
+                yield block
+                block = None
+            else:
+                depth = 1
+        else:
+            yield token
+    if block is not None:
+        yield block
+
+def matches(select, block):
+    if not isinstance(block, Block):
+        return False
+    if select.tag is not None and block.tag != select.tag:
+        return False
+    if select.cls is not None and select.cls not in block.attrs.get('class', '').split():
+        return False
+    if select.text is not None or select.startswith is not None or select.contains is not None:
+        text = block.text
+        if select.text is not None and text != select.text:
+            return False
+        if select.startswith is not None and not text.startswith(select.startswith):
+            return False
+        if select.contains is not None and select.contains not in text:
+            return False
+    return True
+
+def prune_toc(raw, surviving_ids):
+    # Drop entries pointing at missing ids; the children of a dropped entry
+    # move up to its place. Returns (html, entries removed).
+    start = raw.find('<ul>')
+    end = raw.rfind('</ul>')
+    if start == -1 or end == -1:
+        return raw, 0
+    entries = parse_toc_list(raw[start:end + len('</ul>')])
+    kept = [entry for entry in entries if entry[2] in surviving_ids]
+    if len(kept) == len(entries):
+        return raw, 0
+    return raw[:start] + render_toc_list(kept) + raw[end + len('</ul>'):], len(entries) - len(kept)
+
+# --- Engine ----------------------------------------------------------------
+
+def _apply(rule, out, applied, surviving_ids):
+    applied[rule.name] += 1
+    if isinstance(rule, ReplaceRange):
+        out.write(rule.replacement)
+        surviving_ids.update(ID_PATTERN.findall(rule.replacement))
+
+def rewrite(input_path, output_path, rules, chunk_size=1 << 16):
+    # Apply every rule in one tokenizer pass over input_path and write the
+    # result to output_path as it goes. Returns {rule name: times applied}.
+    range_rules = [r for r in rules if isinstance(r, (ReplaceRange, DropRange))]
+    toc_rules = [r for r in rules if isinstance(r, PruneToc)]
+    applied = {rule.name: 0 for rule in rules}
+    surviving_ids = set()
+    held_tocs = []
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with open(input_path, 'r', encoding='utf-8', newline='') as src, \
+            open(output_path + '.tmp', 'w', encoding='utf-8', newline='') as head, \
+            tempfile.TemporaryFile('w+', encoding='utf-8', newline='', dir=output_dir) as spool:
+        # Output goes straight to the file until a TOC has to be held back
+        # (its entries depend on ids further down); after that it is
+        # spooled and copied in behind the pruned TOC at the end.
+        out = head
+        # A range rule only takes effect once its end is seen: the items
+        # from its start on are held until then, and put back unchanged
+        # (with the rule switched off) if the document ends first
+        active = None
+        held = []
+        disabled = set()
+        pending = deque()
+        items = iter_blocks(iter_tokens(src, chunk_size))
+        while True:
+            if pending:
+                item = pending.popleft()
+            else:
+                item = next(items, None)
+                if item is None:
+                    if active is None:
+                        break
+                    disabled.add(active.name)
+                    pending.extend(held)
+                    active = None
+                    held = []
+                    continue
+
+            if active is not None:
+                if not matches(active.end, item):
+                    held.append(item)
+                    continue
+                active_rule, active = active, None
+                held = []
+                _apply(active_rule, out, applied, surviving_ids)
+                if isinstance(active_rule, ReplaceRange):
+                    continue
+
+            rule = next((r for r in range_rules if r.name not in disabled and matches(r.start, item)), None)
+            if rule is not None:
+                if isinstance(rule, ReplaceRange) and matches(rule.end, item):
+                    _apply(rule, out, applied, surviving_ids)
+                else:
+                    active = rule
+                    held = [item]
+                continue
+
+            if isinstance(item, Block):
+                toc_rule = next((r for r in toc_rules if matches(r.select, item)), None)
+                if toc_rule is not None and not held_tocs:
+                    held_tocs.append((toc_rule, item.raw))
+                    out = spool
+                    continue
+                raw = item.raw
+                surviving_ids.update(ID_PATTERN.findall(raw))
+                out.write(raw)
+            else:
+                out.write(item)
+
+        for toc_rule, raw in held_tocs:
+            pruned, removed = prune_toc(raw, surviving_ids)
+            applied[toc_rule.name] += removed
+            head.write(pruned)
+        spool.seek(0)
+        shutil.copyfileobj(spool, head, chunk_size)
+
+    os.replace(output_path + '.tmp', output_path)
+    return applied
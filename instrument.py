@@ -0,0 +1,213 @@
+import atexit
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+# Per-stage instrumentation. Scripts wrap their work in
+#
+#     with stage('process_text') as s:
+#         s.read(input_file)
+#         paragraphs = s.counted(paragraphs, 'paragraphs')
+#         ...
+#
+# When nothing enabled the profiler, stage() hands back a shared no-op
+# object, so the hooks cost one function call per stage.
+#
+# Enable from code with enable(), from pipeline.py with --profile, or for
+# any script through the environment:
+#   BOOK_PROFILE=report.json     write a JSON report when the process exits
+#   BOOK_PROFILE_CPROFILE=dir    also dump one cProfile .prof file per stage
+#   BOOK_PROFILE_MEMORY=0        skip tracemalloc (it slows allocations down)
+
+REPORT_VERSION = 1
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, name, n=1):
+        pass
+
+    def read(self, path):
+        pass
+
+    def wrote(self, path):
+        pass
+
+    def counted(self, iterable, name):
+        return iterable
+
+_NULL_STAGE = _NullStage()
+
+class StageRecord:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.counts = {}
+        self.bytes_read = 0
+        self.outputs = []
+        self.result = None
+        self._cprofile = None
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def read(self, path):
+        # Sized now: several scripts rewrite their input in place
+        self.bytes_read += _size(path)
+
+    def wrote(self, path):
+        self.outputs.append(path)
+
+    def counted(self, iterable, name):
+        for item in iterable:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            yield item
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                profiler._started_tracing = True
+            # Keep the enclosing stage's peak before resetting it for ours
+            current, peak = tracemalloc.get_traced_memory()
+            if profiler._stack:
+                parent = profiler._stack[-1]
+                parent._peak = max(parent._peak, peak - parent._base)
+            self._base = current
+            self._peak = 0
+            tracemalloc.reset_peak()
+        # Only one cProfile can run at a time: the enclosing stage's profile
+        # is paused while a nested stage runs, so each dump holds the time
+        # spent in that stage itself
+        if profiler.profile_dir:
+            if profiler._stack and profiler._stack[-1]._cprofile is not None:
+                profiler._stack[-1]._cprofile.disable()
+            self._cprofile = cProfile.Profile()
+        profiler._stack.append(self)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        cpu = time.process_time() - self._cpu
+        wall = time.perf_counter() - self._wall
+        profiler = self.profiler
+        profiler._stack.pop()
+
+        peak = None
+        if profiler.trace_memory:
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1] - self._base)
+            if profiler._stack:
+                # The parent's peak includes ours
+                parent = profiler._stack[-1]
+                parent._peak = max(parent._peak, self._base - parent._base + peak)
+            tracemalloc.reset_peak()
+
+        profile_file = None
+        if self._cprofile is not None:
+            os.makedirs(profiler.profile_dir, exist_ok=True)
+            profile_file = os.path.join(profiler.profile_dir, f"{len(profiler.records):02d}_{self.name}.prof")
+            self._cprofile.dump_stats(profile_file)
+            self._cprofile = None
+            if profiler._stack and profiler._stack[-1]._cprofile is not None:
+                profiler._stack[-1]._cprofile.enable()
+
+        self.result = {
+            'stage': self.name,
+            'depth': len(profiler._stack),
+            'seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'peak_bytes': peak,
+            'bytes_read': self.bytes_read,
+            'bytes_written': sum(_size(path) for path in self.outputs),
+            'counts': self.counts,
+            'error': repr(exc) if exc is not None else None,
+        }
+        if profile_file:
+            self.result['cprofile'] = profile_file
+        profiler.records.append(self.result)
+        return False
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class Profiler:
+    def __init__(self, trace_memory=True, profile_dir=None):
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.records = []
+        self._stack = []
+        self._started_tracing = False
+
+    def stage(self, name):
+        return StageRecord(self, name)
+
+    def report(self):
+        return {'version': REPORT_VERSION, 'stages': self.records}
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        lines = []
+        for record in self.records:
+            peak = record['peak_bytes']
+            lines.append(f"{'  ' * record['depth']}{record['stage']:28} {record['seconds']:8.3f}s "
+                         f"cpu {record['cpu_seconds']:8.3f}s"
+                         + (f" peak {peak / 1e6:7.1f} MB" if peak is not None else '')
+                         + ''.join(f" {k}={v}" for k, v in record['counts'].items()))
+        return '\n'.join(lines)
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+_profiler = None
+
+def stage(name):
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+def enable(trace_memory=True, profile_dir=None):
+    global _profiler
+    _profiler = Profiler(trace_memory, profile_dir)
+    return _profiler
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+def _enable_from_environment():
+    report_path = os.environ.get('BOOK_PROFILE')
+    if not report_path:
+        return
+    profiler = enable(trace_memory=os.environ.get('BOOK_PROFILE_MEMORY', '1') != '0',
+                      profile_dir=os.environ.get('BOOK_PROFILE_CPROFILE') or None)
+
+    def write():
+        profiler.write_report(report_path)
+        print(profiler.summary())
+        print(f"Profile report written to {report_path}")
+    atexit.register(write)
+
+_enable_from_environment()
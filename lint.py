@@ -0,0 +1,365 @@
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from extract_docx import Image
+from generate_toc import TOC_TITLE
+from process_text import BULLET_PREFIXES, heading_level
+from search_index import normalize
+
+# One finding. paragraph is the 0-based index of the record in the extracted
+# stream (the title is 0), column the character offset in its text, section
+# the heading the record sits under (None before the first heading).
+Finding = namedtuple('Finding', ['rule', 'severity', 'paragraph', 'column', 'section', 'excerpt', 'message'])
+
+SEVERITIES = ('error', 'warning')
+
+# --- Rule registry ---------------------------------------------------------
+# Two kinds of rule:
+#   local rules look at one paragraph's text at a time. They hold no state,
+#   so large documents can be sharded across worker processes for them.
+#   document rules see every record in order and report at the end; they
+#   only act on headings or a handful of sections, so they stay cheap.
+# Rules return a list of findings, or None when there are none (most calls:
+# this keeps the per-paragraph cost down). level is the record's
+# heading level, 0 for body text, and None for the entries of a table of
+# contents typed into the document: those are short lines that would
+# otherwise pass for headings.
+
+RULES = {}
+
+def register(cls):
+    RULES[cls.name] = cls
+    return cls
+
+class Rule:
+    name = None
+    severity = 'warning'
+    local = False
+    # Local rules that only look at headings are not called for body text
+    headings_only = False
+
+    def check(self, text, level):
+        # Local rules: [(column, excerpt, message)] for one paragraph
+        return None
+
+    def record(self, index, record, level):
+        # Document rules: called for every record; [(paragraph, column,
+        # excerpt, message)]
+        return None
+
+    def finish(self):
+        return None
+
+# Arabic letters, Arabic combining marks (harakat), and digits in the
+# Western, Arabic-Indic and Persian forms
+ARABIC = '\u0621-\u064a\u066e-\u06d3\u06d5\u06fa-\u06ff\u0750-\u077f'
+ARABIC_MARKS = '\u064b-\u0670\u06d6-\u06ed'
+DIGITS = '0-9\u0660-\u0669\u06f0-\u06f9'
+LATIN_PATTERN = re.compile(r'[A-Za-z]')
+MIXED_TOKEN_PATTERN = re.compile(rf'\S*[{ARABIC}]\S*[A-Za-z]\S*|\S*[A-Za-z]\S*[{ARABIC}]\S*')
+# Anchored on the digit, so text without digits is skipped at regex speed
+GLUED_DIGIT_PATTERN = re.compile(rf'[{DIGITS}](?<=[{ARABIC}{ARABIC_MARKS}][{DIGITS}])|[{DIGITS}](?=[{ARABIC}])')
+
+# A table of contents or book index typed into the document: a heading
+# naming it, then one "N.title page" entry per line
+TOC_SECTION_TITLES = (TOC_TITLE, 'دليل الكتاب')
+TOC_ENTRY_PATTERN = re.compile(rf'^\s*(?:[{DIGITS}]+\s*[.)]\s*)?(.*?)[\s.…]*[{DIGITS}]+\s*$')
+
+def toc_entry(text):
+    # The title a table of contents line points at, or None
+    m = TOC_ENTRY_PATTERN.match(text)
+    return m.group(1).strip() or None if m else None
+
+@register
+class MixedScript(Rule):
+    # A Latin letter inside an Arabic word, e.g. the E in عَدَدE
+    name = 'mixed-script'
+    severity = 'error'
+    local = True
+
+    def check(self, text, level):
+        if LATIN_PATTERN.search(text):
+            return [(m.start(), m.group(0), "Arabic and Latin letters in one word")
+                    for m in MIXED_TOKEN_PATTERN.finditer(text)]
+
+@register
+class GluedDigits(Rule):
+    # Footnote or page numbers left stuck to a word: الفتنة الكبرى1
+    name = 'glued-digits'
+    local = True
+
+    def check(self, text, level):
+        if level is None:
+            # Page numbers of a table of contents
+            return None
+        findings = []
+        for m in GLUED_DIGIT_PATTERN.finditer(text):
+            start = text.rfind(' ', 0, m.start()) + 1
+            end = text.find(' ', m.end())
+            findings.append((start, text[start:end if end != -1 else len(text)], "digits glued to a word"))
+        return findings
+
+@register
+class BulletHeading(Rule):
+    # A bullet line promoted to a heading (what find_bullet.py looked for)
+    name = 'bullet-heading'
+    severity = 'error'
+    local = True
+    headings_only = True
+
+    def check(self, text, level):
+        if text.startswith(BULLET_PREFIXES):
+            return [(0, text[:40], "bullet line rendered as a heading")]
+
+@register
+class LongHeading(Rule):
+    name = 'long-heading'
+    local = True
+    headings_only = True
+    max_length = 100
+
+    def check(self, text, level):
+        if len(text) > self.max_length:
+            return [(0, text[:40], f"heading is {len(text)} characters long (limit {self.max_length})")]
+
+@register
+class EmptySection(Rule):
+    # A heading with nothing under it before the next heading of the same
+    # or a higher level
+    name = 'empty-section'
+
+    def __init__(self):
+        self.open = None  # (index, title, level, has_content)
+
+    def _close(self, next_level):
+        if self.open is not None:
+            index, title, level, has_content = self.open
+            if not has_content and (next_level is None or next_level <= level):
+                return [(index, 0, title, "section has no content")]
+        return None
+
+    def record(self, index, record, level):
+        if level and index:
+            findings = self._close(level)
+            self.open = (index, record.text, level, False)
+            return findings
+        if self.open is not None and not self.open[3] and (record.text.strip() or isinstance(record, Image)):
+            self.open = self.open[:3] + (True,)
+        return None
+
+    def finish(self):
+        return self._close(None)
+
+@register
+class DuplicateSection(Rule):
+    # The same heading twice; the message says whether the bodies match too
+    name = 'duplicate-section'
+
+    def __init__(self):
+        self.seen = {}      # normalized title -> (index, body hash)
+        self.current = None  # [index, title, normalized title, body hash]
+
+    def _close(self):
+        findings = None
+        if self.current is not None:
+            index, title, key, digest = self.current
+            first = self.seen.get(key)
+            if first is None:
+                self.seen[key] = (index, digest)
+            else:
+                same = "with identical content" if first[1] == digest else "with different content"
+                findings = [(index, 0, title, f"repeats the heading of paragraph {first[0]} {same}")]
+            self.current = None
+        return findings
+
+    def record(self, index, record, level):
+        if level and index:
+            findings = self._close()
+            self.current = [index, record.text, normalize(record.text).strip(), 0]
+            return findings
+        if self.current is not None:
+            # Only compared within one run, so the built-in hash will do
+            self.current[3] = hash((self.current[3], record.text))
+        return None
+
+    def finish(self):
+        return self._close()
+
+@register
+class OrphanedTocTarget(Rule):
+    # Entries of a table of contents typed into the document that name no
+    # heading of the document
+    name = 'orphaned-toc-target'
+
+    def __init__(self):
+        self.entries = []
+        self.titles = set()
+
+    def record(self, index, record, level):
+        if level is None:
+            self.entries.append((index, toc_entry(record.text)))
+        elif level and not any(marker in record.text for marker in TOC_SECTION_TITLES):
+            self.titles.add(normalize(record.text).strip())
+        return None
+
+    def finish(self):
+        return [(index, 0, entry, "table of contents entry matches no heading")
+                for index, entry in self.entries if normalize(entry).strip() not in self.titles]
+
+# --- Engine ----------------------------------------------------------------
+
+def check_shard(rule_names, start, items):
+    # Runs in a worker process: local rules over (text, level) items
+    rules = [RULES[name]() for name in rule_names]
+    findings = []
+    for offset, (text, level) in enumerate(items):
+        _check(rules, start + offset, text, level, findings)
+    return findings
+
+def _check(rules, index, text, level, out):
+    for rule in rules:
+        if level or not rule.headings_only:
+            found = rule.check(text, level)
+            if found:
+                out.extend((rule.name, index, column, excerpt, message) for column, excerpt, message in found)
+
+class Linter:
+    # Lints the extracted paragraph stream in one pass. watch() passes the
+    # records through untouched, so the linter can ride along with the
+    # build's own read of the document:
+    #
+    #     linter = Linter()
+    #     doc = load_document(linter.watch(open_source(source)))
+    #     findings = linter.findings()
+    #
+    # With workers, local rules run on a process pool in shards of
+    # shard_size paragraphs; document rules always run in this process.
+    def __init__(self, rules=None, workers=None, shard_size=5000):
+        names = list(rules) if rules is not None else list(RULES)
+        unknown = [name for name in names if name not in RULES]
+        if unknown:
+            raise ValueError(f"Unknown lint rule(s): {', '.join(unknown)}")
+        self.local_names = [name for name in names if RULES[name].local]
+        self.local_rules = [RULES[name]() for name in self.local_names]
+        self.document_rules = [RULES[name]() for name in names if not RULES[name].local]
+        self.workers = workers
+        self.shard_size = shard_size
+        self._raw = []
+        self._headings = []     # (index, title)
+        self._pool = None
+        self._pending = deque()
+        self._shard = []
+        self._shard_start = 0
+        self._in_toc = False
+
+    def _document(self, rule, found):
+        if found:
+            self._raw.extend((rule.name, index, column, excerpt, message)
+                             for index, column, excerpt, message in found)
+
+    def _flush_shard(self):
+        if self._shard:
+            self._pending.append(self._pool.submit(check_shard, self.local_names, self._shard_start, self._shard))
+            self._shard = []
+        while len(self._pending) > 2 * self.workers:
+            self._raw.extend(self._pending.popleft().result())
+
+    def watch(self, paragraphs):
+        if self.workers and self.local_names:
+            self._pool = ProcessPoolExecutor(self.workers)
+        try:
+            for index, record in enumerate(paragraphs):
+                # The first record is the title, never a section heading
+                level = 1 if index == 0 else heading_level(record)
+                text = record.text
+                if self._in_toc:
+                    if toc_entry(text) is not None:
+                        level = None
+                    elif text.strip():
+                        self._in_toc = False
+                if level and any(marker in text for marker in TOC_SECTION_TITLES):
+                    self._in_toc = True
+                if level and index:
+                    self._headings.append((index, text))
+                if self._pool is not None:
+                    if not self._shard:
+                        self._shard_start = index
+                    self._shard.append((text, level))
+                    if len(self._shard) >= self.shard_size:
+                        self._flush_shard()
+                elif text:
+                    _check(self.local_rules, index, text, level, self._raw)
+                for rule in self.document_rules:
+                    self._document(rule, rule.record(index, record, level))
+                yield record
+            for rule in self.document_rules:
+                self._document(rule, rule.finish())
+            if self._pool is not None:
+                self._flush_shard()
+                while self._pending:
+                    self._raw.extend(self._pending.popleft().result())
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def run(self, paragraphs):
+        for _ in self.watch(paragraphs):
+            pass
+        return self.findings()
+
+    def findings(self):
+        heading_indices = [index for index, _ in self._headings]
+        findings = []
+        for name, index, column, excerpt, message in sorted(self._raw, key=lambda f: (f[1], f[2], f[0])):
+            position = bisect.bisect_right(heading_indices, index) - 1
+            section = self._headings[position][1] if position >= 0 else None
+            findings.append(Finding(name, RULES[name].severity, index, column, section, excerpt, message))
+        return findings
+
+def lint_report(findings):
+    counts = {severity: 0 for severity in SEVERITIES}
+    for finding in findings:
+        counts[finding.severity] += 1
+    return {'counts': counts, 'findings': [finding._asdict() for finding in findings]}
+
+def lint_report_path(html_path):
+    return os.path.splitext(html_path)[0] + '.lint.json'
+
+def write_lint_report(findings, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(lint_report(findings), f, ensure_ascii=False, indent=1)
+
+def format_finding(finding):
+    return (f"{finding.paragraph}:{finding.column}: {finding.severity}: [{finding.rule}] "
+            f"{finding.message}: {finding.excerpt}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the extracted paragraphs for content defects")
+    parser.add_argument('source', nargs='?', default="extracted_content.txt", help=".docx or extracted .txt source")
+    parser.add_argument('--rules', help=f"comma-separated subset of: {', '.join(RULES)}")
+    parser.add_argument('--json', metavar='PATH', help="write the findings as JSON")
+    parser.add_argument('-j', '--workers', type=int, help="shard local rules over N worker processes")
+    parser.add_argument('--fail-on', choices=SEVERITIES,
+                        help="exit with status 1 when there is a finding of this severity or worse")
+    args = parser.parse_args()
+
+    from pipeline import open_source
+    linter = Linter(args.rules.split(',') if args.rules else None, workers=args.workers)
+    findings = linter.run(open_source(args.source))
+    for finding in findings:
+        print(format_finding(finding))
+    report = lint_report(findings)
+    print(f"{len(findings)} findings ({report['counts']['error']} errors, {report['counts']['warning']} warnings)")
+    if args.json:
+        write_lint_report(findings, args.json)
+    if args.fail_on:
+        failing = SEVERITIES[:SEVERITIES.index(args.fail_on) + 1]
+        if any(finding.severity in failing for finding in findings):
+            sys.exit(1)
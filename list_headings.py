@@ -1,4 +1,15 @@
+import sys
+
+from heading_index import fresh_index
+
 def list_headings(file_path):
+    # Answer from the pipeline's sidecar index when there is an up-to-date one
+    index = fresh_index(file_path)
+    if index is not None:
+        for entry in index['headings']:
+            print(f"Line {entry['line']}: {'#' * entry['level']} {entry['title']}")
+        return
+
     with open(file_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
@@ -8,4 +19,4 @@ def list_headings(file_path):
             print(f"Line {i+1}: {line.strip()}")
 
 if __name__ == "__main__":
-    list_headings(r"c:\Antigravity\processed_journey.md")
+    list_headings(sys.argv[1] if len(sys.argv) > 1 else "processed_journey.md")
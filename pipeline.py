@@ -0,0 +1,319 @@
+import argparse
+import os
+from collections import namedtuple
+
+from docx_media import MediaExtractor, media_dir_for
+from extract_docx import Paragraph, iter_paragraphs
+from process_text import (HTML_HEADER, HTML_FOOTER, MD_HEADER, heading_level,
+                          read_paragraphs, render_heading, render_paragraph)
+from generate_toc import HeadingRegistry
+from heading_index import CountingWriter, write_index
+from instrument import stage
+from cleanup_html import ARMY_TABLE_PARAGRAPHS, ARMY_TABLE_END, ARMY_TABLE_TYPO, army_table
+
+# Pre-rendered block that stages can splice into the tree
+RawBlock = namedtuple('RawBlock', ['html', 'md'])
+# Heading entry in the flat node view of a Document
+Heading = namedtuple('Heading', ['level', 'paragraph'])
+
+class Section:
+    # A heading and the blocks (Paragraph / RawBlock) that follow it.
+    # The front matter before the first heading has heading=None.
+    __slots__ = ('heading', 'level', 'blocks')
+
+    def __init__(self, heading=None, level=0, blocks=None):
+        self.heading = heading
+        self.level = level
+        self.blocks = blocks if blocks is not None else []
+
+class Document:
+    __slots__ = ('title', 'sections')
+
+    def __init__(self, title, sections):
+        self.title = title
+        self.sections = sections
+
+    def nodes(self):
+        # Flat view: headings as Heading nodes, blocks as-is
+        for section in self.sections:
+            if section.heading is not None:
+                yield Heading(section.level, section.heading)
+            yield from section.blocks
+
+    @classmethod
+    def from_nodes(cls, title, nodes):
+        sections = [Section()]
+        for node in nodes:
+            if isinstance(node, Heading):
+                sections.append(Section(node.paragraph, node.level))
+            else:
+                sections[-1].blocks.append(node)
+        return cls(title, sections)
+
+def load_document(paragraphs):
+    # Build the section tree in one pass over the paragraph records
+    title = None
+    sections = [Section()]
+    for paragraph in paragraphs:
+        if title is None:
+            # First paragraph is likely title
+            title = paragraph
+            continue
+        level = heading_level(paragraph)
+        if level:
+            sections.append(Section(paragraph, level))
+        else:
+            sections[-1].blocks.append(paragraph)
+    return Document(title, sections)
+
+def open_source(source, media_dir=None, extract_cache=None):
+    # With media_dir, pictures in a .docx are copied there and rendered;
+    # with an extract_cache.ExtractionCache, an unchanged .docx is not parsed
+    if source.lower().endswith('.docx'):
+        media = MediaExtractor(media_dir) if media_dir else None
+        if extract_cache is not None:
+            return extract_cache.paragraphs(source, media)
+        return iter_paragraphs(source, media)
+    return read_paragraphs(source)
+
+# --- Transform stages ------------------------------------------------------
+# Each stage takes a Document and returns a Document (usually the same one).
+
+def drop_index_section(doc, marker='دليل الكتاب'):
+    # Replaces cleanup_and_regenerate step 1 and cleanup_html step 2: the
+    # companion index at the end of the book is not part of the body.
+    # Dropped sections also drop out of both TOCs since those are built
+    # from the remaining tree.
+    for i, section in enumerate(doc.sections):
+        if section.heading is not None and marker in section.heading.text:
+            del doc.sections[i:]
+            break
+    return doc
+
+def demote_bullet_headings(doc):
+    # Replaces cleanup_and_regenerate step 2 for sources that still promote
+    # bullet lines to headings (e.g. bullets typed into a heading style)
+    sections = [doc.sections[0]]
+    for section in doc.sections[1:]:
+        if '•' in section.heading.text:
+            text = section.heading.text.lstrip('•').strip()
+            sections[-1].blocks.append(Paragraph(text, 'List Paragraph', None, 0))
+            sections[-1].blocks.extend(section.blocks)
+        else:
+            sections.append(section)
+    doc.sections = sections
+    return doc
+
+def fix_army_table(doc):
+    # Replaces cleanup_html step 1 for text sources, where the table
+    # cells were flattened into headings: the typo'd paragraph and those
+    # cells become the real table. .docx sources extract it natively.
+    nodes = list(doc.nodes())
+    start = end = None
+    for i, node in enumerate(nodes):
+        if isinstance(node, Heading):
+            text = node.paragraph.text
+        else:
+            text = getattr(node, 'text', '')
+        if start is None and text.startswith(ARMY_TABLE_TYPO):
+            start = i
+        elif start is not None and text == ARMY_TABLE_END:
+            end = i
+            break
+    if start is None or end is None:
+        return doc
+
+    nodes[start:end + 1] = [Paragraph(text, 'Normal') for text in ARMY_TABLE_PARAGRAPHS] + [army_table()]
+    return Document.from_nodes(doc.title, nodes)
+
+DEFAULT_STAGES = [drop_index_section, demote_bullet_headings]
+# Text sources have lost their tables; put back the ones we know about
+TEXT_SOURCE_STAGES = DEFAULT_STAGES + [fix_army_table]
+
+def stages_for(source):
+    return DEFAULT_STAGES if source.lower().endswith('.docx') else TEXT_SOURCE_STAGES
+
+# --- Output ----------------------------------------------------------------
+
+def heading_registry(doc):
+    registry = HeadingRegistry()
+    for section in doc.sections:
+        if section.heading is not None:
+            registry.add(section.level, section.heading.text)
+    return registry
+
+def section_anchors(doc, registry=None):
+    # One anchor per section, None for the front matter. Same anchors as
+    # process_text gives the same headings.
+    anchors = iter((registry or heading_registry(doc)).anchors())
+    return [next(anchors) if section.heading is not None else None for section in doc.sections]
+
+def render_block(block):
+    if isinstance(block, RawBlock):
+        return block.html, block.md
+    return render_paragraph(block)
+
+def emit(doc, output_html, output_md, cache=None):
+    registry = heading_registry(doc)
+    anchors = section_anchors(doc, registry)
+
+    # Single output pass: both files are written side by side. newline=''
+    # keeps byte offsets exact for the heading index. They are written
+    # under temporary names and swapped in at the end, so a reader (or a
+    # browser reloading a preview) never sees a half-written file.
+    with open(output_html + '.tmp', 'w', encoding='utf-8', newline='') as html_raw, \
+            open(output_md + '.tmp', 'w', encoding='utf-8', newline='') as md_raw:
+        html_file = CountingWriter(html_raw)
+        md_file = CountingWriter(md_raw)
+
+        html_file.write(HTML_HEADER)
+        html_file.write(registry.toc_html())
+
+        md_file.write(MD_HEADER.rstrip('\n') + '\n\n')
+        md_file.write(''.join(registry.toc_md_lines()))
+        md_file.write('\n')
+
+        if doc.title is not None:
+            html_file.write(f"<h1>{doc.title.text}</h1>\n")
+
+        live_keys = set()
+        for section, anchor in zip(doc.sections, anchors):
+            if section.heading is not None:
+                html, md = render_heading(section.heading.text, section.level, anchor)
+                html_file.write_heading(html, section.level, section.heading.text, anchor, '<h')
+                md_file.write_heading(md, section.level, section.heading.text, anchor, '#')
+
+            # Anchors depend on position, so only the body is cached and the
+            # heading is always rendered fresh
+            body = None
+            if cache is not None:
+                key = cache.key(section)
+                live_keys.add(key)
+                body = cache.get(key)
+            if body is None:
+                fragments = [render_block(block) for block in section.blocks]
+                body = (''.join(html for html, _ in fragments),
+                        ''.join(md for _, md in fragments))
+                if cache is not None:
+                    cache.put(key, *body)
+            html_file.write(body[0])
+            md_file.write(body[1])
+
+        # The last section ends where the footer begins
+        html_file.close_sections()
+        md_file.close_sections()
+        html_file.write(HTML_FOOTER)
+
+    os.replace(output_html + '.tmp', output_html)
+    os.replace(output_md + '.tmp', output_md)
+    write_index(output_html, html_file)
+    write_index(output_md, md_file)
+
+    if cache is not None:
+        cache.evict(live_keys)
+
+def build(source, output_html, output_md, stages=DEFAULT_STAGES, cache=None, extract_cache=None, linter=None):
+    # With a lint.Linter, the paragraph stream is linted as it is loaded
+    with stage('build'):
+        with stage('load_document') as s:
+            s.read(source)
+            paragraphs = open_source(source, media_dir_for(output_html), extract_cache)
+            if linter is not None:
+                paragraphs = linter.watch(paragraphs)
+            doc = load_document(s.counted(paragraphs, 'paragraphs'))
+            s.count('sections', len(doc.sections) - 1)
+        for transform in stages:
+            with stage(transform.__name__) as s:
+                doc = transform(doc)
+                s.count('sections', len(doc.sections) - 1)
+        with stage('emit') as s:
+            s.wrote(output_html)
+            s.wrote(output_md)
+            emit(doc, output_html, output_md, cache=cache)
+    return doc
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the HTML and Markdown book in one pass")
+    parser.add_argument('source', nargs='?', default="extracted_content.txt",
+                        help=".docx or extracted .txt source")
+    parser.add_argument('--html', default="processed_journey.html")
+    parser.add_argument('--md', default="processed_journey.md")
+    parser.add_argument('--raw', action='store_true', help="skip the cleanup stages")
+    parser.add_argument('--cache-dir', help="reuse rendered sections from this build cache")
+    parser.add_argument('--extract-cache', metavar='DIR',
+                        help="reuse the extracted records of an unchanged .docx from this cache")
+    parser.add_argument('--split', metavar='DIR',
+                        help="also write one fragment per chapter plus a lazy-loading index page to DIR")
+    parser.add_argument('--hashed', action='store_true',
+                        help="with --split, write content-hashed assets, a manifest and a deploy diff")
+    parser.add_argument('--no-search-index', action='store_true',
+                        help="do not write the search index next to the HTML output")
+    parser.add_argument('--no-lint', action='store_true',
+                        help="do not lint the source (findings go next to the HTML output)")
+    parser.add_argument('--publish', metavar='DIR',
+                        help="also write minified, precompressed copies of every output to DIR")
+    parser.add_argument('--profile', metavar='JSON', help="write a per-stage timing and memory report")
+    parser.add_argument('--cprofile', metavar='DIR', help="with --profile, dump a cProfile file per stage")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        import instrument
+        profiler = instrument.enable(profile_dir=args.cprofile)
+
+    stages = [] if args.raw else list(stages_for(args.source))
+    if not args.no_search_index:
+        # Last, so its anchors are the ones emit() writes
+        from search_index import search_index_stage
+        stages.append(search_index_stage(args.html))
+
+    cache = None
+    if args.cache_dir:
+        from build_cache import SectionCache
+        cache = SectionCache(args.cache_dir, scope=args.source)
+
+    extract_cache = None
+    if args.extract_cache:
+        from extract_cache import ExtractionCache
+        extract_cache = ExtractionCache(args.extract_cache)
+
+    linter = None
+    if not args.no_lint:
+        from lint import Linter
+        linter = Linter()
+
+    doc = build(args.source, args.html, args.md,
+                stages=stages, cache=cache, extract_cache=extract_cache, linter=linter)
+    print(f"Build complete: {len(doc.sections) - 1} sections -> {args.html}, {args.md}")
+    if cache is not None:
+        print(f"Section cache: {cache.hits} reused, {cache.misses} rendered")
+    if extract_cache is not None:
+        print(f"Extraction cache: {'hit' if extract_cache.hits else 'miss'}")
+    if linter is not None:
+        from lint import lint_report_path, write_lint_report
+        findings = linter.findings()
+        write_lint_report(findings, lint_report_path(args.html))
+        errors = sum(1 for finding in findings if finding.severity == 'error')
+        print(f"Lint: {len(findings)} findings ({errors} errors) -> {lint_report_path(args.html)}")
+    if args.split:
+        from split_output import write_split
+        manifest = write_split(doc, args.split, render_block, section_anchors(doc), hashed=args.hashed,
+                               media_dir=media_dir_for(args.html))
+        largest = max(chapter['bytes'] for chapter in manifest['chapters'])
+        print(f"Split output: {len(manifest['chapters'])} chapters (largest {largest} bytes) -> {args.split}")
+        if args.hashed:
+            diff = manifest['diff']
+            print(f"Deploy diff: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+                  f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged; "
+                  f"upload {len(diff['upload'])} files, {diff['upload_bytes']} of {diff['total_bytes']} bytes")
+    if args.publish:
+        from publish import publish, format_report
+        from search_index import search_index_path
+        artifacts = [args.html, args.md, search_index_path(args.html), media_dir_for(args.html)]
+        if args.split:
+            artifacts.append(args.split)
+        print(format_report(publish(artifacts, args.publish)))
+    if profiler is not None:
+        profiler.write_report(args.profile)
+        print(profiler.summary())
+        print(f"Profile report written to {args.profile}")
@@ -1,22 +1,18 @@
+import html as html_lib
+import os
 import re
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from extract_docx import Image, Paragraph, Table
+from generate_toc import HeadingRegistry
+from heading_index import discard_index
+from instrument import stage
 
-def process_text(input_file, output_html, output_md):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    # Clean lines
-    lines = [line.strip() for line in lines if line.strip()]
-
-    structured_content = []
-    toc = []
-    
-    # Heuristics for headings
-    # We assume short lines that don't end with typical sentence endings are headings
-    # Or specific keywords
-    
-    current_section_id = 0
-    
-    html_content = """
+BOOK_TITLE = "رحلة الحج إلى الجنان - الفتنة الكبرى"
+
+HTML_HEADER = """
 <!DOCTYPE html>
 <html lang="ar" dir="rtl">
 <head>
@@ -119,6 +115,31 @@ def process_text(input_file, output_html, output_md):
             color: #c0392b;
         }
         
+        .doc-table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 20px 0;
+        }
+        
+        .doc-table th, .doc-table td {
+            padding: 10px;
+            border: 1px solid #ddd;
+        }
+        
+        .doc-table thead tr {
+            background-color: #f2f2f2;
+        }
+        
+        figure {
+            margin: 20px 0;
+            text-align: center;
+        }
+        
+        figure img {
+            max-width: 100%;
+            height: auto;
+        }
+        
         .footer {
             text-align: center;
             margin-top: 50px;
@@ -139,53 +160,7 @@ def process_text(input_file, output_html, output_md):
     <div class="container">
     """
 
-    md_content = "# رحلة الحج إلى الجنان - الفتنة الكبرى\n\n"
-    
-    # Generate TOC placeholder
-    html_body = ""
-    
-    # Process lines
-    # First line is likely title
-    if lines:
-        title = lines[0]
-        html_body += f"<h1>{title}</h1>\n"
-        # md_content is already set with a title, but let's respect the file's title if different
-        
-    
-    for i, line in enumerate(lines):
-        if i == 0: continue # Skip title as we handled it
-        
-        # Check if heading
-        # Logic: Short line, no ending punctuation (., !, ?), or starts with specific words
-        is_heading = False
-        if len(line) < 80 and not line.endswith(('.', ':', '!', '؟')):
-            is_heading = True
-        elif re.match(r'^(الفصل|الباب|مقدمة|خاتمة|المبحث|مطلب)', line):
-            is_heading = True
-            
-        if is_heading:
-            current_section_id += 1
-            anchor = f"section_{current_section_id}"
-            toc.append((anchor, line))
-            html_body += f'<h2 id="{anchor}">{line}</h2>\n'
-            md_content += f"\n## {line}\n\n"
-        else:
-            # Check for bullet points
-            if line.startswith('•') or line.startswith('-') or line.startswith('*'):
-                html_body += f"<ul><li>{line[1:].strip()}</li></ul>\n" # Simple list handling
-                md_content += f"- {line[1:].strip()}\n"
-            else:
-                html_body += f"<p>{line}</p>\n"
-                md_content += f"{line}\n\n"
-
-    # Build TOC HTML
-    toc_html = '<div class="toc"><h2>فهرس المحتويات</h2><ul>'
-    for anchor, title in toc:
-        toc_html += f'<li><a href="#{anchor}">{title}</a></li>'
-    toc_html += '</ul></div>'
-    
-    # Assemble final HTML
-    final_html = html_content + toc_html + html_body + """
+HTML_FOOTER = """
         <div class="footer">
             <p>تم إعداد هذا الملف وتنسيقه آلياً</p>
         </div>
@@ -193,13 +168,290 @@ def process_text(input_file, output_html, output_md):
 </body>
 </html>
     """
-    
+
+MD_HEADER = f"# {BOOK_TITLE}\n\n"
+
+def html_header(title=None):
+    # HTML_HEADER for another document; None keeps the book's title
+    if title is None:
+        return HTML_HEADER
+    return HTML_HEADER.replace(f"<title>{BOOK_TITLE}</title>",
+                               f"<title>{html_lib.escape(title, quote=False)}</title>", 1)
+
+def md_header(title=None):
+    return MD_HEADER if title is None else f"# {title}\n\n"
+
+# Heuristics for headings in unstyled text
+# We assume short lines that don't end with typical sentence endings are headings
+# Or specific keywords
+HEADING_KEYWORDS = re.compile(r'^(الفصل|الباب|مقدمة|خاتمة|المبحث|مطلب)')
+BULLET_PREFIXES = ('•', '-', '*')
+
+def looks_like_heading(line):
+    # Logic: Short line, no ending punctuation (., !, ?), or starts with specific words
+    if len(line) < 80 and not line.endswith(('.', ':', '!', '؟')):
+        return True
+    return bool(HEADING_KEYWORDS.match(line))
+
+def heading_level(paragraph):
+    # 1, 2 or 3 for headings, 0 for body text.
+    # Styled paragraphs are trusted as-is: Title -> h1, Heading 1 -> h2,
+    # Heading 2 and deeper -> h3 (the document title already owns h1).
+    if isinstance(paragraph, (Table, Image)):
+        return 0
+    if paragraph.style is not None and paragraph.style.lower() == 'title':
+        return 1
+    if paragraph.outline_level is not None:
+        return 2 if paragraph.outline_level == 0 else 3
+    if paragraph.style is None and paragraph.list_level is None:
+        # Plain text: a bullet is never a heading, whatever its length
+        if paragraph.text.startswith(BULLET_PREFIXES):
+            return 0
+        return 2 if looks_like_heading(paragraph.text) else 0
+    return 0
+
+def list_item(paragraph):
+    # Return (level, text) for list items, None otherwise
+    if paragraph.list_level is not None:
+        return paragraph.list_level, paragraph.text
+    if paragraph.style is None and paragraph.text.startswith(BULLET_PREFIXES):
+        return 0, paragraph.text[1:].strip()
+    return None
+
+def render_heading(text, level, anchor=None):
+    id_attr = f' id="{anchor}"' if anchor else ''
+    return f'<h{level}{id_attr}>{text}</h{level}>\n', f"\n{'#' * level} {text}\n\n"
+
+def _html_cell(text):
+    return text.replace('\n', '<br>')
+
+def _md_cell(text):
+    return text.replace('|', '\\|').replace('\n', '<br>')
+
+def render_table(table):
+    # The first row is the header; short rows are padded so both formats
+    # get a rectangular table
+    width = max(len(row) for row in table.rows)
+    rows = [row + [''] * (width - len(row)) for row in table.rows]
+    header, body = rows[0], rows[1:]
+
+    html = ['<table class="doc-table">\n<thead>\n<tr>\n']
+    html.extend(f"<th>{_html_cell(cell)}</th>\n" for cell in header)
+    html.append('</tr>\n</thead>\n<tbody>\n')
+    for row in body:
+        html.append('<tr>\n')
+        html.extend(f"<td>{_html_cell(cell)}</td>\n" for cell in row)
+        html.append('</tr>\n')
+    html.append('</tbody>\n</table>\n')
+
+    md = ['| ' + ' | '.join(_md_cell(cell) for cell in header) + ' |\n',
+          '|' + '---|' * width + '\n']
+    md.extend('| ' + ' | '.join(_md_cell(cell) for cell in row) + ' |\n' for row in body)
+    md.append('\n')
+    return ''.join(html), ''.join(md)
+
+def render_image(image):
+    # width/height let the browser reserve the box before the file arrives
+    alt = image.alt.replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;')
+    size = f' width="{image.width}" height="{image.height}"' if image.width and image.height else ''
+    html = f'<figure><img src="{image.src}" alt="{alt}"{size} loading="lazy" decoding="async"></figure>\n'
+    md_alt = image.alt.replace('[', '\\[').replace(']', '\\]').replace('\n', ' ')
+    return html, f"![{md_alt}]({image.src})\n\n"
+
+def render_paragraph(paragraph, anchor=None):
+    # Render one non-title paragraph (or table, or image) as (html, md) fragments
+    if isinstance(paragraph, Table):
+        return render_table(paragraph)
+    if isinstance(paragraph, Image):
+        return render_image(paragraph)
+    line = paragraph.text
+    level = heading_level(paragraph)
+    if level:
+        return render_heading(line, level, anchor)
+
+    item = list_item(paragraph)
+    if item is not None:
+        list_level, text = item
+        return f"<ul><li>{text}</li></ul>\n", f"{'  ' * list_level}- {text}\n" # Simple list handling
+
+    return f"<p>{line}</p>\n", f"{line}\n\n"
+
+def read_paragraphs(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            # Clean lines
+            line = line.strip()
+            if line:
+                yield Paragraph(line)
+
+def iter_fragments(paragraphs, registry):
+    # Yield (html, md) fragments for the body in document order; headings
+    # are registered (and get their anchors) as they go by
+    # First paragraph is likely title
+    for i, paragraph in enumerate(paragraphs):
+        if i == 0:
+            # md is already set with a title
+            yield f"<h1>{paragraph.text}</h1>\n", ""
+            continue
+
+        anchor = None
+        level = heading_level(paragraph)
+        if level:
+            anchor = registry.add(level, paragraph.text)
+
+        yield render_paragraph(paragraph, anchor)
+
+def render_toc_md(registry):
+    return ''.join(registry.toc_md_lines()) + '\n'
+
+def process_paragraphs(paragraphs, output_html, output_md, title=None):
+    registry = HeadingRegistry()
+    md_parts = []
+    html_parts = []
+
+    for html, md in iter_fragments(paragraphs, registry):
+        html_parts.append(html)
+        md_parts.append(md)
+
+    # Assemble final HTML
+    final_html = html_header(title) + registry.toc_html() + ''.join(html_parts) + HTML_FOOTER
+
     with open(output_html, 'w', encoding='utf-8') as f:
         f.write(final_html)
-        
+
     with open(output_md, 'w', encoding='utf-8') as f:
-        f.write(md_content)
+        f.write(md_header(title) + render_toc_md(registry) + ''.join(md_parts))
+
+    return registry.entries
+
+def _assemble(registry, html_body, md_body, output_html, output_md, buffer_size, title=None):
+    # Both TOCs precede the body they describe, so bodies are spooled and
+    # copied in behind them once every heading has been registered
+    html_body.seek(0)
+    md_body.seek(0)
+    with open(output_html, 'w', encoding='utf-8', buffering=buffer_size) as html_file:
+        html_file.write(html_header(title))
+        html_file.write(registry.toc_html())
+        shutil.copyfileobj(html_body, html_file, buffer_size)
+        html_file.write(HTML_FOOTER)
+    with open(output_md, 'w', encoding='utf-8', buffering=buffer_size) as md_file:
+        md_file.write(md_header(title))
+        md_file.write(render_toc_md(registry))
+        shutil.copyfileobj(md_body, md_file, buffer_size)
+
+def _spool(output_html):
+    # Spool next to the output so the final copy stays on one filesystem
+    output_dir = os.path.dirname(os.path.abspath(output_html))
+    return tempfile.TemporaryFile('w+', encoding='utf-8', dir=output_dir)
+
+def process_paragraphs_streaming(paragraphs, output_html, output_md, buffer_size=1 << 16, title=None):
+    # Same output as process_paragraphs, but fragments go straight to
+    # temporary files instead of lists and the pages are assembled from
+    # them at the end.
+    registry = HeadingRegistry()
+    with _spool(output_html) as html_body, _spool(output_html) as md_body:
+        for html, md in iter_fragments(paragraphs, registry):
+            html_body.write(html)
+            md_body.write(md)
+        _assemble(registry, html_body, md_body, output_html, output_md, buffer_size, title)
+    return registry.entries
+
+def iter_batches(paragraphs, registry, batch_size):
+    # Split the body (everything after the title) into lists of
+    # (paragraph, anchor), cutting only in front of a heading once a batch
+    # holds batch_size paragraphs. Anchors are handed out here, in order,
+    # which is the only state the renderer carries between paragraphs.
+    batch = []
+    for paragraph in paragraphs:
+        anchor = None
+        level = heading_level(paragraph)
+        if level:
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+            anchor = registry.add(level, paragraph.text)
+        batch.append((paragraph, anchor))
+    if batch:
+        yield batch
+
+def render_batch(batch):
+    # Runs in a worker process
+    fragments = [render_paragraph(paragraph, anchor) for paragraph, anchor in batch]
+    return ''.join(html for html, _ in fragments), ''.join(md for _, md in fragments)
+
+def process_paragraphs_parallel(paragraphs, output_html, output_md, workers=None,
+                                batch_size=2000, buffer_size=1 << 16, title=None):
+    # Same output as process_paragraphs, with batches of sections rendered
+    # on a process pool. At most two batches per worker are in flight and
+    # results are written back in submission order, so memory stays bounded
+    # and the bytes match the serial renderer.
+    registry = HeadingRegistry()
+    workers = workers or os.cpu_count() or 1
+    paragraphs = iter(paragraphs)
+    with ProcessPoolExecutor(workers) as pool, _spool(output_html) as html_body, _spool(output_html) as md_body:
+        first = next(paragraphs, None)
+        if first is not None:
+            html_body.write(f"<h1>{first.text}</h1>\n")
+
+        pending = deque()
+        for batch in iter_batches(paragraphs, registry, batch_size):
+            pending.append(pool.submit(render_batch, batch))
+            if len(pending) >= 2 * workers:
+                html, md = pending.popleft().result()
+                html_body.write(html)
+                md_body.write(md)
+        while pending:
+            html, md = pending.popleft().result()
+            html_body.write(html)
+            md_body.write(md)
+        _assemble(registry, html_body, md_body, output_html, output_md, buffer_size, title)
+    return registry.entries
+
+def render_to_files(paragraphs, output_html, output_md, stream=False, source=None, workers=None):
+    with stage('process_text') as s:
+        if source is not None:
+            s.read(source)
+        s.wrote(output_html)
+        s.wrote(output_md)
+        paragraphs = s.counted(paragraphs, 'paragraphs')
+        if workers:
+            toc = process_paragraphs_parallel(paragraphs, output_html, output_md, workers)
+        elif stream:
+            toc = process_paragraphs_streaming(paragraphs, output_html, output_md)
+        else:
+            toc = process_paragraphs(paragraphs, output_html, output_md)
+        s.count('sections', len(toc))
+    # A sidecar index left by an earlier pipeline build describes other bytes
+    discard_index(output_html)
+    discard_index(output_md)
+    return toc
+
+def process_text(input_file, output_html, output_md, stream=False, workers=None):
+    return render_to_files(read_paragraphs(input_file), output_html, output_md, stream, input_file, workers)
 
 if __name__ == "__main__":
-    process_text("extracted_content.txt", "processed_journey.html", "processed_journey.md")
+    import argparse
+    parser = argparse.ArgumentParser(description="Render extracted text or a .docx to HTML and Markdown")
+    parser.add_argument('source', nargs='?', default="extracted_content.txt")
+    parser.add_argument('--stream', action='store_true',
+                        help="write fragments straight to disk instead of building the page in memory")
+    parser.add_argument('-j', '--workers', type=int,
+                        help="render sections on N worker processes (0: one per CPU)")
+    args = parser.parse_args()
+    workers = None
+    if args.workers is not None:
+        workers = args.workers or os.cpu_count()
+
+    if args.source.lower().endswith('.docx'):
+        # Render straight from the styled paragraph records
+        from docx_media import MediaExtractor, media_dir_for
+        from extract_docx import iter_paragraphs
+        media = MediaExtractor(media_dir_for("processed_journey.html"))
+        render_to_files(iter_paragraphs(args.source, media), "processed_journey.html", "processed_journey.md",
+                        args.stream, args.source, workers)
+        if media.extracted or media.skipped:
+            print(f"Images: {media.extracted} extracted, {media.skipped} already in {media.assets_dir}")
+    else:
+        process_text(args.source, "processed_journey.html", "processed_journey.md",
+                     stream=args.stream, workers=workers)
     print("Processing complete.")
@@ -0,0 +1,229 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Inline style merging --------------------------------------------------
+
+START_TAG_PATTERN = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+STYLE_ATTR_PATTERN = re.compile(r'\sstyle="([^"]*)"')
+CLASS_ATTR_PATTERN = re.compile(r'\sclass="([^"]*)"')
+
+def _normalize_style(style):
+    declarations = [d.strip() for d in style.split(';') if d.strip()]
+    return ';'.join(re.sub(r'\s*:\s*', ':', d, count=1) for d in declarations)
+
+def merge_inline_styles(html, min_repeats=2, prefix='st'):
+    # Every style="..." used at least min_repeats times becomes a class; the
+    # rules are appended to the page's first <style> block
+    counts = Counter(_normalize_style(m.group(1)) for m in STYLE_ATTR_PATTERN.finditer(html))
+    classes = {}
+    for style, count in counts.most_common():
+        if style and count >= min_repeats:
+            classes[style] = f"{prefix}{len(classes) + 1}"
+    if not classes:
+        return html, 0
+
+    def replace_tag(m):
+        tag, attrs, slash = m.group(1), m.group(2) or '', m.group(3)
+        style_match = STYLE_ATTR_PATTERN.search(attrs)
+        if style_match is None:
+            return m.group(0)
+        name = classes.get(_normalize_style(style_match.group(1)))
+        if name is None:
+            return m.group(0)
+        attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+        class_match = CLASS_ATTR_PATTERN.search(attrs)
+        if class_match is not None:
+            attrs = (attrs[:class_match.start()]
+                     + f' class="{class_match.group(1)} {name}"' + attrs[class_match.end():])
+        else:
+            attrs = f' class="{name}"' + attrs
+        return f"<{tag}{attrs}{slash}>"
+
+    html = START_TAG_PATTERN.sub(replace_tag, html)
+    rules = ''.join(f".{name}{{{style}}}" for style, name in classes.items())
+    if '</style>' in html:
+        html = html.replace('</style>', rules + '</style>', 1)
+    elif '</head>' in html:
+        html = html.replace('</head>', f"<style>{rules}</style></head>", 1)
+    else:
+        html = f"<style>{rules}</style>" + html
+    return html, len(classes)
+
+# --- Minification ----------------------------------------------------------
+# Only ASCII whitespace is touched. Arabic text, bidi marks (RLM, LRM, ALM),
+# ZWJ/ZWNJ and non-breaking spaces are passed through unchanged, and the
+# dir/lang attributes are never rewritten.
+
+TOKEN_PATTERN = re.compile(r'(<!--.*?-->|<[^>]*>)', re.DOTALL)
+TAG_NAME_PATTERN = re.compile(r'</?([a-zA-Z][a-zA-Z0-9]*)')
+ASCII_SPACE = re.compile(r'[ \t\r\n\f]+')
+# Whitespace next to these tags does not render
+BLOCK_TAGS = {'html', 'head', 'body', 'meta', 'link', 'title', 'style', 'script', 'div', 'p',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'table', 'thead', 'tbody',
+              'tfoot', 'tr', 'th', 'td', 'br', 'hr', 'figure', 'figcaption', 'blockquote',
+              'section', 'article', 'nav', 'header', 'footer', 'main', '!doctype'}
+PRESERVE_TAGS = {'pre', 'textarea', 'script'}
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = ASCII_SPACE.sub(' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # Only after ':' - a space before it can be a descendant combinator
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+def _tag_name(token):
+    if token.lower().startswith('<!doctype'):
+        return '!doctype'
+    m = TAG_NAME_PATTERN.match(token)
+    return m.group(1).lower() if m else None
+
+def minify_html(html):
+    tokens = TOKEN_PATTERN.split(html)
+    out = []
+    raw = None          # inside <style>/<script>/<pre>/<textarea>
+    pending = None      # whitespace-only text waiting for the next tag
+    previous_block = True
+    for i, token in enumerate(tokens):
+        if not token:
+            continue
+        if i % 2:
+            # Tag or comment
+            if raw is not None:
+                if _tag_name(token) == raw and token.startswith('</'):
+                    raw = None
+                out.append(token)
+                continue
+            if token.startswith('<!--'):
+                continue
+            name = _tag_name(token)
+            is_block = name in BLOCK_TAGS
+            if pending is not None and not (is_block or previous_block):
+                out.append(' ')
+            pending = None
+            out.append(ASCII_SPACE.sub(' ', token))
+            previous_block = is_block
+            if not token.startswith('</') and name in PRESERVE_TAGS | {'style'}:
+                raw = name
+            continue
+
+        if raw == 'style':
+            out.append(minify_css(token))
+        elif raw is not None:
+            out.append(token)
+        elif not ASCII_SPACE.sub('', token):
+            pending = token
+        else:
+            text = ASCII_SPACE.sub(' ', token)
+            if previous_block:
+                text = text.lstrip(' ')
+            if pending is not None and not previous_block:
+                out.append(' ')
+            pending = None
+            out.append(text)
+            previous_block = False
+    return ''.join(out).strip()
+
+def _strip_block_edges(html):
+    # A space left in front of a closing block tag does not render either
+    return re.sub(r' (</(?:%s)>)' % '|'.join(t for t in BLOCK_TAGS if t != '!doctype'), r'\1', html)
+
+# --- Publishing ------------------------------------------------------------
+
+def compress(path):
+    # Writes path.gz (and path.br when brotli is installed); returns sizes.
+    # mtime=0 keeps the gzip bytes identical across builds.
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {}
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    sizes['gz'] = os.path.getsize(path + '.gz')
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        sizes['br'] = os.path.getsize(path + '.br')
+    return sizes
+
+def publish_file(path, output_path):
+    original = os.path.getsize(path)
+    merged = 0
+    if path.lower().endswith(('.html', '.htm')):
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        html, merged = merge_inline_styles(html)
+        html = _strip_block_edges(minify_html(html))
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(html)
+    elif path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    else:
+        # Markdown and anything else: whitespace is content
+        shutil.copyfile(path, output_path)
+    record = {'file': output_path, 'original': original,
+              'minified': os.path.getsize(output_path), 'classes': merged}
+    record.update(compress(output_path))
+    return record
+
+def iter_artifacts(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if not name.endswith(('.gz', '.br')):
+                        full = os.path.join(root, name)
+                        yield full, os.path.relpath(full, os.path.dirname(os.path.abspath(path)))
+        elif os.path.exists(path):
+            yield path, os.path.basename(path)
+
+def publish(paths, output_dir='publish'):
+    records = []
+    for path, relative in iter_artifacts(paths):
+        output_path = os.path.join(output_dir, relative)
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        records.append(publish_file(path, output_path))
+    return records
+
+def format_report(records):
+    lines = [f"{'file':48} {'original':>10} {'minified':>10} {'gzip':>10} {'brotli':>10}"]
+    totals = Counter()
+    for r in records:
+        lines.append(f"{r['file'][-48:]:48} {r['original']:>10} {r['minified']:>10} {r['gz']:>10} "
+                     f"{r.get('br', '-'):>10}")
+        totals.update({k: r[k] for k in ('original', 'minified', 'gz', 'br') if k in r})
+    if records:
+        best = totals['br'] if brotli is not None else totals['gz']
+        lines.append(f"{'total':48} {totals['original']:>10} {totals['minified']:>10} {totals['gz']:>10} "
+                     f"{totals['br'] if brotli is not None else '-':>10}")
+        lines.append(f"Readers download {best} of {totals['original']} bytes "
+                     f"({100 * best / totals['original']:.1f}%)")
+    if brotli is None:
+        lines.append("brotli is not installed; only .gz files were written (pip install brotli)")
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minify and precompress built artifacts for publishing")
+    parser.add_argument('paths', nargs='*', help="files or folders (default: the built book)")
+    parser.add_argument('-o', '--output-dir', default='publish')
+    parser.add_argument('--report', metavar='JSON', help="also write the size report as JSON")
+    args = parser.parse_args()
+
+    paths = args.paths or ["processed_journey.html", "processed_journey.md", "processed_journey.search.json"]
+    records = publish(paths, args.output_dir)
+    print(format_report(records))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2)
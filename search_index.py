@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict, namedtuple
+
+SEARCH_SUFFIX = '.search.json'
+SEARCH_VERSION = 1
+
+# --- Normalization ---------------------------------------------------------
+# The book is fully vocalized but readers type without tashkeel and are
+# loose with hamza seats, so both the index and the queries are folded the
+# same way before tokenizing.
+
+# Harakat, tanween, shadda, sukun, Quranic marks, dagger alef and tatweel
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+LETTER_FOLDS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و', 'ئ': 'ي', 'ى': 'ي',
+    'ة': 'ه',
+})
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def normalize(text):
+    return DIACRITICS.sub('', text).translate(LETTER_FOLDS).lower()
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+# --- Building --------------------------------------------------------------
+
+def search_index_path(html_path):
+    return os.path.splitext(html_path)[0] + SEARCH_SUFFIX
+
+def _section_texts(doc, anchors):
+    for i, (section, anchor) in enumerate(zip(doc.sections, anchors)):
+        texts = []
+        if i == 0 and doc.title is not None:
+            texts.append(doc.title.text)
+        if section.heading is not None:
+            texts.append(section.heading.text)
+        # Paragraph records have text; pre-rendered blocks are searched
+        # through their Markdown form
+        texts.extend(getattr(block, 'text', None) or getattr(block, 'md', '')
+                     for block in section.blocks)
+        title = section.heading.text if section.heading is not None else None
+        yield anchor, title, texts
+
+def build_postings(doc, anchors):
+    # term -> [(section number, [token positions])], sections in order
+    sections = []
+    postings = defaultdict(list)
+    for number, (anchor, title, texts) in enumerate(_section_texts(doc, anchors)):
+        sections.append([anchor, title])
+        positions = defaultdict(list)
+        position = 0
+        for text in texts:
+            for token in tokenize(text):
+                positions[token].append(position)
+                position += 1
+        for token, token_positions in positions.items():
+            postings[token].append((number, token_positions))
+    return sections, postings
+
+def _encode(entries):
+    # Flat delta-encoded list: section delta, hit count, then position deltas
+    flat = []
+    previous_section = 0
+    for section, positions in entries:
+        flat.append(section - previous_section)
+        flat.append(len(positions))
+        previous = 0
+        for position in positions:
+            flat.append(position - previous)
+            previous = position
+        previous_section = section
+    return flat
+
+def _decode(flat):
+    entries = []
+    i = 0
+    section = 0
+    while i < len(flat):
+        section += flat[i]
+        count = flat[i + 1]
+        i += 2
+        positions = []
+        position = 0
+        for delta in flat[i:i + count]:
+            position += delta
+            positions.append(position)
+        i += count
+        entries.append((section, positions))
+    return entries
+
+def write_search_index(doc, path, anchors):
+    sections, postings = build_postings(doc, anchors)
+    index = {
+        'version': SEARCH_VERSION,
+        'sections': sections,
+        'terms': {term: _encode(postings[term]) for term in sorted(postings)},
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return len(postings)
+
+def search_index_stage(html_path):
+    # Pipeline stage: writes the index next to the HTML output and passes
+    # the document through. Run it last so anchors match the output.
+    from pipeline import section_anchors
+
+    def search_index(doc):
+        write_search_index(doc, search_index_path(html_path), section_anchors(doc))
+        return doc
+    return search_index
+
+# --- Querying --------------------------------------------------------------
+
+Hit = namedtuple('Hit', ['anchor', 'title', 'positions'])
+
+class SearchIndex:
+    def __init__(self, index):
+        if index.get('version') != SEARCH_VERSION:
+            raise ValueError("search index version mismatch; rebuild with pipeline.py")
+        self.sections = index['sections']
+        self.terms = index['terms']
+        self._decoded = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def postings(self, term):
+        # Decoded lazily and memoized: {section number: [positions]}
+        if term not in self._decoded:
+            flat = self.terms.get(term)
+            self._decoded[term] = dict(_decode(flat)) if flat else {}
+        return self._decoded[term]
+
+    def search(self, query, phrase=False):
+        # Sections containing every query token (as consecutive tokens when
+        # phrase=True), most hits first. Hits carry the positions of the
+        # first token of the query.
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        lists = [self.postings(token) for token in tokens]
+        common = set(lists[0]).intersection(*lists[1:])
+        hits = []
+        for section in common:
+            if phrase:
+                following = [set(postings[section]) for postings in lists[1:]]
+                positions = [p for p in lists[0][section]
+                             if all(p + k + 1 in s for k, s in enumerate(following))]
+                if not positions:
+                    continue
+            else:
+                positions = lists[0][section]
+            anchor, title = self.sections[section]
+            hits.append((section, Hit(anchor, title, positions)))
+        hits.sort(key=lambda item: (-len(item[1].positions), item[0]))
+        return [hit for _, hit in hits]
+
+def _scan(html_path, query):
+    # What search costs without the index: normalize and scan everything
+    with open(html_path, 'r', encoding='utf-8') as f:
+        text = re.sub(r'<[^>]+>', ' ', f.read())
+    return normalize(text).count(' '.join(tokenize(query)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the diacritic-insensitive search index")
+    parser.add_argument('query', nargs='+')
+    parser.add_argument('--html', default="processed_journey.html", help="built HTML output")
+    parser.add_argument('--phrase', action='store_true', help="match the words as a phrase")
+    parser.add_argument('--bench', type=int, metavar='N',
+                        help="time N indexed lookups against N full-document scans")
+    args = parser.parse_args()
+    query = ' '.join(args.query)
+
+    start = time.perf_counter()
+    index = SearchIndex.load(search_index_path(args.html))
+    load_time = time.perf_counter() - start
+
+    hits = index.search(query, phrase=args.phrase)
+    for hit in hits:
+        where = f"#{hit.anchor}" if hit.anchor else "(front matter)"
+        print(f"{where}: {len(hit.positions)} hits  {hit.title or ''}")
+    print(f"{len(hits)} sections match")
+
+    if args.bench:
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            # Cold lookups: drop the decoded postings every round
+            index._decoded.clear()
+            index.search(query, phrase=args.phrase)
+        lookup_time = (time.perf_counter() - start) / args.bench
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            _scan(args.html, query)
+        scan_time = (time.perf_counter() - start) / args.bench
+        print(f"Index load: {load_time * 1000:.2f} ms")
+        print(f"Indexed lookup: {lookup_time * 1e6:.1f} us/query")
+        print(f"Full scan: {scan_time * 1e6:.1f} us/query ({scan_time / lookup_time:.0f}x slower)")
@@ -0,0 +1,114 @@
+import argparse
+import bisect
+import mmap
+import os
+import re
+import sys
+from collections import namedtuple
+
+from heading_index import fresh_index
+
+Match = namedtuple('Match', ['pattern', 'offset', 'end', 'line', 'text', 'section'])
+
+# Checks run before publishing a book: index markers that must not be in
+# the body and bullet lines that ended up as headings
+PRESETS = {
+    'publish': {
+        'literals': ['دليل الكتاب', 'الفتنة الكبرى1'],
+        'regexes': [r'^#+ .*•', r'<h[1-6][^>]*>•'],
+    },
+}
+
+class MultiSearch:
+    # Literals are found with bytes.find, which runs a fast substring
+    # search in C per literal and reports overlapping hits. The regexes
+    # share one named-group alternation, one re pass for all of them.
+    # Both are much cheaper than a per-byte loop in Python; line numbers
+    # are only worked out for the offsets that matched.
+    def __init__(self, literals=(), regexes=()):
+        self.literals = list(literals)
+        self.regexes = list(regexes)
+        self.encoded = [literal.encode('utf-8') for literal in self.literals]
+        self.combined = None
+        if self.regexes:
+            alternation = b'|'.join(b'(?P<r%d>%s)' % (i, r.encode('utf-8'))
+                                    for i, r in enumerate(self.regexes))
+            self.combined = re.compile(alternation, re.MULTILINE)
+
+    def _raw_matches(self, data):
+        for literal, encoded in zip(self.literals, self.encoded):
+            if not encoded:
+                continue
+            start = data.find(encoded)
+            while start != -1:
+                yield literal, start, start + len(encoded)
+                start = data.find(encoded, start + 1)
+        if self.combined is not None:
+            for m in self.combined.finditer(data):
+                index = int(m.lastgroup[1:])
+                yield self.regexes[index], m.start(), m.end()
+
+    def search_file(self, path, with_sections=False):
+        if os.path.getsize(path) == 0:
+            return []
+        sections = _section_starts(path) if with_sections else None
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                raw = sorted(self._raw_matches(mm), key=lambda m: (m[1], m[0]))
+                matches = []
+                # Matches come in offset order, so newlines are counted
+                # once, from one match to the next
+                line = 1
+                counted = 0
+                for pattern, start, end in raw:
+                    line += mm[counted:start].count(b'\n')
+                    counted = start
+                    line_start = mm.rfind(b'\n', 0, start) + 1
+                    line_end = mm.find(b'\n', start)
+                    if line_end == -1:
+                        line_end = len(mm)
+                    section = None
+                    if sections:
+                        i = bisect.bisect_right(sections[0], start) - 1
+                        section = sections[1][i] if i >= 0 else None
+                    matches.append(Match(pattern, start, end, line,
+                                         mm[line_start:line_end].decode('utf-8', 'replace').strip(),
+                                         section))
+        return matches
+
+def _section_starts(path):
+    # Enclosing sections come from the heading index written by the pipeline
+    index = fresh_index(path)
+    if index is None:
+        return None
+    headings = index['headings']
+    return [h['offset'] for h in headings], [h['title'] for h in headings]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search files for many literals and regexes")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-e', '--literal', action='append', default=[], help="literal text (repeatable)")
+    parser.add_argument('-r', '--regex', action='append', default=[], help="regular expression (repeatable)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), help="add a predefined set of checks")
+    parser.add_argument('--sections', action='store_true', help="report the enclosing section")
+    parser.add_argument('--gate', action='store_true', help="exit with status 1 if anything matches")
+    args = parser.parse_args()
+
+    literals = list(args.literal)
+    regexes = list(args.regex)
+    if args.preset:
+        literals += PRESETS[args.preset]['literals']
+        regexes += PRESETS[args.preset]['regexes']
+    if not literals and not regexes:
+        parser.error("give at least one -e, -r or --preset")
+
+    search = MultiSearch(literals, regexes)
+    total = 0
+    for path in args.files:
+        for m in search.search_file(path, with_sections=args.sections):
+            total += 1
+            where = f" [{m.section}]" if m.section else ''
+            print(f"{path}:{m.line}:{m.offset}: {m.pattern}{where}: {m.text[:120]}")
+    print(f"{total} matches")
+    if args.gate and total:
+        sys.exit(1)
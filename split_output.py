@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import re
+
+from extract_docx import Image
+from generate_toc import TOC_TITLE, render_toc_list
+from process_text import HTML_HEADER, render_heading
+
+# The shell reuses the page CSS, minus the render-blocking font @import
+# (fonts are loaded asynchronously from <head> instead)
+FONT_URL = 'https://fonts.googleapis.com/css2?family=Amiri:ital,wght@0,400;0,700;1,400&family=Aref+Ruqaa&display=swap'
+
+def shell_css():
+    css = HTML_HEADER[HTML_HEADER.index('<style>') + len('<style>'):HTML_HEADER.index('</style>')]
+    return re.sub(r'\s*@import url\([^)]*\);', '', css)
+
+SHELL_SCRIPT = """
+(function () {
+    var chapters = JSON.parse(document.getElementById('chapters').textContent);
+    var byAnchor = {};
+    chapters.forEach(function (chapter, i) {
+        chapter.anchors.forEach(function (anchor) { byAnchor[anchor] = i; });
+    });
+    var content = document.getElementById('content');
+    var cache = {};
+    var current = -1;
+
+    function fetchChapter(i) {
+        if (!cache[i]) {
+            cache[i] = fetch(chapters[i].file).then(function (response) {
+                if (!response.ok) throw new Error(response.status);
+                return response.text();
+            });
+        }
+        return cache[i];
+    }
+
+    function show(anchor) {
+        var i = anchor in byAnchor ? byAnchor[anchor] : 0;
+        var load = i === current ? Promise.resolve(null) : fetchChapter(i);
+        load.then(function (html) {
+            if (html !== null) {
+                content.innerHTML = html;
+                current = i;
+            }
+            var target = anchor && document.getElementById(anchor);
+            if (target) target.scrollIntoView();
+            else if (html !== null) window.scrollTo(0, 0);
+            // Warm up the next chapter while this one is being read
+            if (i + 1 < chapters.length) fetchChapter(i + 1);
+        }).catch(function () {
+            delete cache[i];
+            content.innerHTML = '<p>تعذر تحميل الفصل. حاول مرة أخرى.</p>';
+        });
+    }
+
+    // Browsers report the fragment percent-encoded; anchors are Arabic
+    function currentAnchor() {
+        try {
+            return decodeURIComponent(location.hash.slice(1));
+        } catch (e) {
+            return location.hash.slice(1);
+        }
+    }
+
+    window.addEventListener('hashchange', function () { show(currentAnchor()); });
+    show(currentAnchor());
+})();
+"""
+
+def chapter_groups(doc, anchors):
+    # A chapter is a top-level section plus the deeper sections under it.
+    # The title and front matter ride along with the first chapter.
+    levels = [s.level for s in doc.sections if s.heading is not None]
+    top_level = min(levels) if levels else 2
+    groups = [[]]
+    for section, anchor in zip(doc.sections, anchors):
+        if section.heading is not None and section.level == top_level and groups[-1] \
+                and any(s.heading is not None for s, _ in groups[-1]):
+            groups.append([])
+        groups[-1].append((section, anchor))
+    return groups
+
+# Hashed mode: same convention as netlify.toml, everything under /assets/
+# has a content hash in its name and can be cached forever
+HEADERS = """/assets/*
+  Cache-Control: public, max-age=31536000, immutable
+/*
+  Cache-Control: no-cache
+"""
+
+class ArtifactWriter:
+    # Writes artifacts under their logical name, or under a content-hashed
+    # name in assets/ when hashed=True. The hashed name depends on the bytes
+    # alone, so an artifact that did not change keeps its file whatever its
+    # logical name or position; a file that already exists is not rewritten.
+    def __init__(self, output_dir, hashed=False):
+        self.output_dir = output_dir
+        self.hashed = hashed
+        self.assets = {}
+
+    def write(self, logical, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if self.hashed:
+            file_name = f"assets/{digest[:16]}{os.path.splitext(logical)[1]}"
+        else:
+            file_name = logical
+        path = os.path.join(self.output_dir, file_name)
+        if not (self.hashed and os.path.exists(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        self.assets[logical] = {'file': file_name, 'bytes': len(data), 'sha256': digest}
+        return file_name
+
+def diff_manifests(previous, current):
+    # Which logical artifacts changed since the previous build, and which
+    # files a deploy has to upload: those the previous build did not have
+    # with the same bytes (only index.html keeps its name when it changes)
+    before = previous.get('assets', {}) if previous else {}
+    after = current['assets']
+    report = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+    for name, entry in after.items():
+        if name not in before:
+            report['added'].append(name)
+        elif before[name]['sha256'] != entry['sha256']:
+            report['changed'].append(name)
+        else:
+            report['unchanged'].append(name)
+    report['removed'] = sorted(set(before) - set(after))
+    files = {entry['file']: entry for entry in after.values()}
+    deployed = {(entry['file'], entry['sha256']) for entry in before.values()}
+    report['upload'] = sorted(name for name, entry in files.items() if (name, entry['sha256']) not in deployed)
+    report['upload_bytes'] = sum(files[name]['bytes'] for name in report['upload'])
+    report['total_bytes'] = sum(entry['bytes'] for entry in files.values())
+    return report
+
+class MediaCopier:
+    # Copies the pictures the chapters use from media_dir (the folder the
+    # single-page output points at) into the split output, as media/NAME
+    # or as hashed assets, and hands back the src to use instead. Pictures
+    # that are not in media_dir keep their src.
+    def __init__(self, writer, media_dir):
+        self.writer = writer
+        self.media_dir = media_dir
+        self.files = {}
+
+    def src(self, image):
+        name = os.path.basename(image.src)
+        logical = f"media/{name}"
+        if logical not in self.files:
+            path = os.path.join(self.media_dir, name) if self.media_dir else None
+            if path is None or not os.path.isfile(path):
+                return image.src
+            with open(path, 'rb') as f:
+                self.files[logical] = self.writer.write(logical, f.read())
+        return self.files[logical]
+
+def write_split(doc, output_dir, render_block, anchors, hashed=False, media_dir=None):
+    # Writes output_dir/index.html (TOC shell), one fragment per chapter and
+    # output_dir/manifest.json. Chapters are chapters/NNN.html, or with
+    # hashed=True content-hashed files in assets/ next to the CSS and
+    # loader script; the manifest then maps logical names to those files
+    # and output_dir/deploy-diff.json lists what changed since last build
+    # and which files are new.
+    # Pictures are copied from media_dir next to the chapters (see
+    # MediaCopier) and listed under 'media'.
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    previous = None
+    if hashed and os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    writer = ArtifactWriter(output_dir, hashed)
+    media = MediaCopier(writer, media_dir)
+
+    chapters = []
+    toc_entries = []
+    for number, group in enumerate(chapter_groups(doc, anchors)):
+        parts = []
+        if number == 0 and doc.title is not None:
+            parts.append(f"<h1>{doc.title.text}</h1>\n")
+        chapter_anchors = []
+        title = None
+        for section, anchor in group:
+            if section.heading is not None:
+                html, _ = render_heading(section.heading.text, section.level, anchor)
+                parts.append(html)
+                chapter_anchors.append(anchor)
+                toc_entries.append((section.level, section.heading.text, anchor))
+                if title is None:
+                    title = section.heading.text
+            for block in section.blocks:
+                if isinstance(block, Image):
+                    # Fragments are shown inside index.html, so their
+                    # pictures resolve against output_dir
+                    block = block._replace(src=media.src(block))
+                parts.append(render_block(block)[0])
+
+        data = ''.join(parts).encode('utf-8')
+        # Hashed builds key a chapter by its first anchor, so a chapter
+        # inserted before it does not make it look changed in the diff
+        key = chapter_anchors[0] if hashed and chapter_anchors else f"{number:03d}"
+        file_name = writer.write(f"chapters/{key}.html", data)
+        chapters.append({'file': file_name, 'title': title, 'anchors': chapter_anchors, 'bytes': len(data)})
+
+    title_text = doc.title.text if doc.title is not None else ''
+    shell_chapters = [{'file': c['file'], 'anchors': c['anchors']} for c in chapters]
+    if hashed:
+        css = f'<link rel="stylesheet" href="{writer.write("book.css", shell_css().encode("utf-8"))}">'
+        script = f'<script src="{writer.write("loader.js", SHELL_SCRIPT.encode("utf-8"))}"></script>'
+    else:
+        css = f"<style>{shell_css()}</style>"
+        script = f"<script>{SHELL_SCRIPT}</script>"
+    shell = f"""<!DOCTYPE html>
+<html lang="ar" dir="rtl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title_text}</title>
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link rel="stylesheet" href="{FONT_URL}" media="print" onload="this.media='all'">
+    <link rel="preload" href="{chapters[0]['file']}" as="fetch" crossorigin>
+    {css}
+</head>
+<body>
+    <div class="container">
+    <div class="toc"><h2>{TOC_TITLE}</h2>{render_toc_list(toc_entries)}</div>
+    <div id="content"></div>
+        <div class="footer">
+            <p>تم إعداد هذا الملف وتنسيقه آلياً</p>
+        </div>
+    </div>
+    <script type="application/json" id="chapters">{json.dumps(shell_chapters, ensure_ascii=False)}</script>
+    {script}
+</body>
+</html>
+"""
+    # The entry point keeps its name; it is the only page that changes
+    # whenever anything does
+    writer.hashed = False
+    writer.write('index.html', shell.encode('utf-8'))
+
+    manifest = {'title': title_text, 'index': 'index.html', 'chapters': chapters, 'media': media.files}
+    if hashed:
+        manifest['assets'] = writer.assets
+        manifest['diff'] = diff_manifests(previous, manifest)
+        with open(os.path.join(output_dir, '_headers'), 'w', encoding='utf-8') as f:
+            f.write(HEADERS)
+        with open(os.path.join(output_dir, 'deploy-diff.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest['diff'], f, ensure_ascii=False, indent=2)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
@@ -0,0 +1,145 @@
+import argparse
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+# Minimal but valid WordprocessingML package: enough parts for Word to open
+# it and for extract_docx to see styles, numbered lists and tables.
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+<Override PartName="/word/numbering.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>
+</Types>"""
+
+PACKAGE_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering" Target="numbering.xml"/>
+</Relationships>"""
+
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:pPr><w:bidi/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="0"/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="1"/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="ListParagraph"><w:name w:val="List Paragraph"/><w:basedOn w:val="Normal"/></w:style>
+<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/></w:style>
+</w:styles>"""
+
+NUMBERING = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:numbering xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:abstractNum w:abstractNumId="0">
+<w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="bullet"/><w:lvlText w:val="•"/></w:lvl>
+<w:lvl w:ilvl="1"><w:start w:val="1"/><w:numFmt w:val="bullet"/><w:lvlText w:val="◦"/></w:lvl>
+</w:abstractNum>
+<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>
+</w:numbering>"""
+
+DOCUMENT_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>"""
+DOCUMENT_END = """<w:sectPr><w:bidi/></w:sectPr></w:body></w:document>"""
+
+# Fully vocalized vocabulary, in the register of the book
+WORDS = [
+    'قَالَ', 'الإِمَامُ', 'عَلِيٌّ', 'رَضِيَ', 'اللَّهُ', 'عَنْهُ', 'فِي', 'مَعْرَكَةِ', 'الجَمَلِ',
+    'وَخَرَجَ', 'الجَيْشُ', 'إِلَى', 'البَصْرَةِ', 'بَعْدَ', 'أَنْ', 'اجْتَمَعَ', 'النَّاسُ',
+    'عَلَى', 'الصُّلْحِ', 'وَكَانَ', 'عَدَدُ', 'جَيْشِ', 'المُنَافِقِينَ', 'كَبِيرًا', 'مِنَ',
+    'الصَّحَابَةِ', 'الكِرَامِ', 'وَالتَّابِعِينَ', 'لَهُمْ', 'بِإِحْسَانٍ', 'أُمِّ', 'المُؤْمِنِينَ',
+    'عَائِشَةَ', 'الفِتْنَةُ', 'الكُبْرَى', 'سَيِّدُنَا', 'سَعْدٌ', 'النَّهْرَوَانِ', 'صِفِّينَ',
+    'رِسَالَةٌ', 'وَهِيَ', 'مَدِينَةٌ', 'عَظِيمَةٌ', 'يَوْمَ', 'القِيَامَةِ', 'الحَقُّ', 'بَيْنَ',
+]
+
+def _run(text):
+    return f'<w:r><w:rPr><w:rtl/></w:rPr><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+def _paragraph(text, style=None, list_level=None):
+    ppr = ''
+    if style or list_level is not None:
+        ppr = '<w:pPr>'
+        if style:
+            ppr += f'<w:pStyle w:val="{style}"/>'
+        if list_level is not None:
+            ppr += f'<w:numPr><w:ilvl w:val="{list_level}"/><w:numId w:val="1"/></w:numPr>'
+        ppr += '<w:bidi/></w:pPr>'
+    return f'<w:p>{ppr}{_run(text)}</w:p>'
+
+def _table(rows):
+    xml = ['<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:bidiVisual/></w:tblPr>']
+    for row in rows:
+        xml.append('<w:tr>')
+        xml.extend(f'<w:tc>{_paragraph(cell)}</w:tc>' for cell in row)
+        xml.append('</w:tr>')
+    xml.append('</w:tbl>')
+    return ''.join(xml)
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+def iter_body(paragraphs, seed=0):
+    # Yields (xml, paragraph count) pieces: a title, then chapters of
+    # headings, body text, bullet runs and the occasional table. Table cells
+    # count as paragraphs since that is how extract_docx reports them.
+    rng = random.Random(seed)
+    yield _paragraph(_sentence(rng, 3, 6), 'Title'), 1
+    written = 1
+    while written < paragraphs:
+        roll = rng.random()
+        if roll < 0.05:
+            yield _paragraph(_sentence(rng, 3, 8), 'Heading1'), 1
+            written += 1
+        elif roll < 0.10:
+            yield _paragraph(_sentence(rng, 3, 8), 'Heading2'), 1
+            written += 1
+        elif roll < 0.18:
+            for _ in range(min(rng.randint(2, 6), paragraphs - written)):
+                yield _paragraph(_sentence(rng, 4, 15), 'ListParagraph', rng.choice((0, 0, 1))), 1
+                written += 1
+        elif roll < 0.19 and paragraphs - written >= 12:
+            columns = rng.randint(2, 4)
+            rows = [[_sentence(rng, 1, 3) for _ in range(columns)]
+                    for _ in range(min(rng.randint(2, 6), (paragraphs - written) // columns))]
+            yield _table(rows), columns * len(rows)
+            written += columns * len(rows)
+        else:
+            yield _paragraph(_sentence(rng, 12, 60)), 1
+            written += 1
+
+def write_synthetic_docx(path, paragraphs, seed=0):
+    # document.xml is streamed into the archive, so generating 500k
+    # paragraphs does not need the whole body in memory
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zf.writestr('_rels/.rels', PACKAGE_RELS)
+        zf.writestr('word/_rels/document.xml.rels', DOCUMENT_RELS)
+        zf.writestr('word/styles.xml', STYLES)
+        zf.writestr('word/numbering.xml', NUMBERING)
+        with zf.open('word/document.xml', 'w', force_zip64=True) as f:
+            f.write(DOCUMENT_START.encode('utf-8'))
+            batch = []
+            for xml, _ in iter_body(paragraphs, seed):
+                batch.append(xml)
+                if len(batch) >= 1000:
+                    f.write(''.join(batch).encode('utf-8'))
+                    batch = []
+            f.write(''.join(batch).encode('utf-8'))
+            f.write(DOCUMENT_END.encode('utf-8'))
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic vocalized Arabic .docx")
+    parser.add_argument('output')
+    parser.add_argument('-n', '--paragraphs', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic_docx(args.output, args.paragraphs, args.seed)
+    print(f"Wrote {args.paragraphs} paragraphs to {args.output}")
@@ -0,0 +1,48 @@
+import os
+import struct
+import sys
+import zipfile
+
+import pytest
+
+# The scripts live at the repository root and import each other by name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import synth_docx
+
+def png_bytes(width, height):
+    # Signature and IHDR: all image_size() reads
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height) + b'\0' * 5
+
+PICTURE_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+<Relationship Id="rId9" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" Target="media/image1.png"/>
+</Relationships>"""
+
+PICTURE_BODY = """<w:p><w:pPr><w:pStyle w:val="Title"/></w:pPr><w:r><w:t>الكتاب</w:t></w:r></w:p>
+<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>الفصل الأول</w:t></w:r></w:p>
+<w:p><w:r><w:t>قبل الصورة</w:t></w:r><w:r><w:drawing
+ xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+ xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"
+ xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><wp:inline>
+<wp:extent cx="952500" cy="476250"/><wp:docPr id="1" name="Picture 1" descr="خريطة"/>
+<a:graphic><a:graphicData><a:blip r:embed="rId9"/></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>
+<w:p><w:r><w:t>بعد الصورة</w:t></w:r></w:p>"""
+
+@pytest.fixture
+def picture_docx(tmp_path):
+    # Factory: a small .docx with one embedded PNG of the given size
+    def write(name='book.docx', width=40, height=20):
+        path = str(tmp_path / name)
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('[Content_Types].xml', synth_docx.CONTENT_TYPES)
+            zf.writestr('_rels/.rels', synth_docx.PACKAGE_RELS)
+            zf.writestr('word/_rels/document.xml.rels', PICTURE_RELS)
+            zf.writestr('word/styles.xml', synth_docx.STYLES)
+            zf.writestr('word/document.xml', synth_docx.DOCUMENT_START + PICTURE_BODY + synth_docx.DOCUMENT_END)
+            zf.writestr('word/media/image1.png', png_bytes(width, height))
+        return path
+    return write
@@ -0,0 +1,59 @@
+import os
+import zipfile
+
+import synth_docx
+from batch_convert import convert_batch, convert_document, output_names
+from process_text import BOOK_TITLE, HTML_HEADER, MD_HEADER, html_header, md_header
+
+def _docx(path, body):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('[Content_Types].xml', synth_docx.CONTENT_TYPES)
+        zf.writestr('_rels/.rels', synth_docx.PACKAGE_RELS)
+        zf.writestr('word/_rels/document.xml.rels', synth_docx.DOCUMENT_RELS)
+        zf.writestr('word/styles.xml', synth_docx.STYLES)
+        zf.writestr('word/document.xml', synth_docx.DOCUMENT_START + body + synth_docx.DOCUMENT_END)
+    return path
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def test_title_comes_from_the_first_record(tmp_path):
+    docx = _docx(str(tmp_path / 'report.docx'),
+                 '<w:p><w:pPr><w:pStyle w:val="Title"/></w:pPr><w:r><w:t>نظام التقييم &amp; المتابعة</w:t></w:r></w:p>'
+                 '<w:p><w:r><w:t>نص.</w:t></w:r></w:p>')
+    record = convert_document(docx, str(tmp_path), 'report')
+    assert record['status'] == 'ok'
+    assert record['title'] == 'نظام التقييم & المتابعة'
+    html = _read(record['html'])
+    assert '<title>نظام التقييم &amp; المتابعة</title>' in html
+    assert BOOK_TITLE not in html
+    assert _read(record['md']).startswith('# نظام التقييم & المتابعة\n\n')
+
+def test_title_falls_back_to_the_file_name(tmp_path):
+    docx = _docx(str(tmp_path / 'تقرير.docx'),
+                 '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>خلية</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+                 '<w:p><w:r><w:t>نص.</w:t></w:r></w:p>')
+    record = convert_document(docx, str(tmp_path), 'out')
+    assert record['title'] == 'تقرير'
+    assert '<title>تقرير</title>' in _read(record['html'])
+
+def test_default_headers_keep_the_book_title():
+    assert html_header() == HTML_HEADER
+    assert md_header() == MD_HEADER
+    assert f"<title>{BOOK_TITLE}</title>" in HTML_HEADER
+
+def test_output_names_are_unique():
+    assert output_names(['a/book.docx', 'b/book.docx', 'c/other.docx']) == ['book', 'book-2', 'other']
+
+def test_batch_reports_failures_without_stopping(tmp_path):
+    books = tmp_path / 'books'
+    books.mkdir()
+    synth_docx.write_synthetic_docx(str(books / 'good.docx'), 50)
+    (books / 'bad.docx').write_bytes(b'not a zip')
+    (books / '~$good.docx').write_bytes(b'lock file')
+    manifest = convert_batch(str(books), str(tmp_path / 'out'), workers=2)
+    assert (manifest['ok'], manifest['failed']) == (1, 1)
+    statuses = {os.path.basename(doc['source']): doc['status'] for doc in manifest['documents']}
+    assert statuses == {'bad.docx': 'error', 'good.docx': 'ok'}
+    assert os.path.exists(os.path.join(str(tmp_path / 'out'), 'manifest.json'))
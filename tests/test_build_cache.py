@@ -0,0 +1,65 @@
+import os
+
+from build_cache import MemorySectionCache, SectionCache
+from pipeline import build
+from synth_docx import write_synthetic_docx
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _entries(cache):
+    return {name for name in os.listdir(cache.scope_dir) if name.endswith('.json')}
+
+def test_rebuild_reuses_every_section_and_matches(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 400, seed=3)
+    html, md = str(tmp_path / 'plain.html'), str(tmp_path / 'plain.md')
+    build(docx, html, md)
+
+    cache = SectionCache(str(tmp_path / 'cache'), scope=docx)
+    cached_html, cached_md = str(tmp_path / 'cached.html'), str(tmp_path / 'cached.md')
+    build(docx, cached_html, cached_md, cache=cache)
+    rendered = cache.misses
+    assert rendered and cache.hits == 0
+    build(docx, cached_html, cached_md, cache=cache)
+    assert cache.hits == rendered
+    assert _read(cached_html) == _read(html)
+    assert _read(cached_md) == _read(md)
+
+def test_documents_sharing_a_cache_keep_their_entries(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    caches = {}
+    for seed, name in enumerate(['a.docx', 'b.docx']):
+        docx = str(tmp_path / name)
+        write_synthetic_docx(docx, 200, seed=seed)
+        caches[name] = SectionCache(cache_dir, scope=docx)
+        build(docx, str(tmp_path / f"{name}.html"), str(tmp_path / f"{name}.md"), cache=caches[name])
+    kept = _entries(caches['a.docx'])
+    assert kept and caches['a.docx'].scope_dir != caches['b.docx'].scope_dir
+
+    # Building b again (changed) evicts only b's stale entries
+    write_synthetic_docx(str(tmp_path / 'b.docx'), 200, seed=7)
+    before_b = _entries(caches['b.docx'])
+    build(str(tmp_path / 'b.docx'), str(tmp_path / 'b.html'), str(tmp_path / 'b.md'), cache=caches['b.docx'])
+    assert _entries(caches['a.docx']) == kept
+    assert not before_b <= _entries(caches['b.docx'])
+
+    again = SectionCache(cache_dir, scope=str(tmp_path / 'a.docx'))
+    build(str(tmp_path / 'a.docx'), str(tmp_path / 'a2.html'), str(tmp_path / 'a2.md'), cache=again)
+    assert again.misses == 0
+
+def test_same_name_in_different_folders_is_a_different_scope(tmp_path):
+    one = SectionCache(str(tmp_path / 'cache'), scope=str(tmp_path / 'x' / 'book.docx'))
+    two = SectionCache(str(tmp_path / 'cache'), scope=str(tmp_path / 'y' / 'book.docx'))
+    assert one.scope_dir != two.scope_dir
+    assert os.path.basename(one.scope_dir).startswith('book-')
+
+def test_memory_cache_evicts_dead_sections():
+    cache = MemorySectionCache()
+    cache.put('a', '<p>a</p>', 'a')
+    cache.put('b', '<p>b</p>', 'b')
+    assert cache.evict({'a'}) == 1
+    assert cache.get('a') == ('<p>a</p>', 'a')
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,54 @@
+import os
+import struct
+import zipfile
+
+from conftest import png_bytes
+from docx_media import MediaExtractor, image_size, load_image_rels, media_dir_for
+from extract_docx import Image, iter_paragraphs
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_image_size_reads_headers(tmp_path):
+    assert image_size(_write(tmp_path / 'a.png', png_bytes(640, 480))) == (640, 480)
+    assert image_size(_write(tmp_path / 'a.gif', b'GIF89a' + struct.pack('<HH', 32, 16) + b'\0' * 8)) == (32, 16)
+    bmp = b'BM' + b'\0' * 16 + struct.pack('<ii', 100, -50) + b'\0' * 8
+    assert image_size(_write(tmp_path / 'a.bmp', bmp)) == (100, 50)
+    vp8x = b'RIFF\0\0\0\0WEBPVP8X' + b'\0' * 8 + (299).to_bytes(3, 'little') + (199).to_bytes(3, 'little')
+    assert image_size(_write(tmp_path / 'a.webp', vp8x)) == (300, 200)
+    # APP0 segment, then SOF0 with height 120 and width 160
+    jpeg = (b'\xff\xd8' + b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + b'\0' * 9
+            + b'\xff\xc0' + struct.pack('>HBHH', 17, 8, 120, 160) + b'\0' * 12)
+    assert image_size(_write(tmp_path / 'a.jpg', jpeg)) == (160, 120)
+    assert image_size(_write(tmp_path / 'a.txt', b'not an image at all')) is None
+
+def test_media_dir_for():
+    assert media_dir_for(os.path.join('out', 'book.html')) == os.path.join('out', 'book_media')
+
+def test_pictures_become_image_records(tmp_path, picture_docx):
+    docx = picture_docx(width=40, height=20)
+    with zipfile.ZipFile(docx) as zf:
+        assert load_image_rels(zf) == {'rId9': 'word/media/image1.png'}
+    media = MediaExtractor(str(tmp_path / 'book_media'))
+    records = list(iter_paragraphs(docx, media))
+    assert [r.text for r in records] == ['الكتاب', 'الفصل الأول', 'قبل الصورة', '', 'بعد الصورة']
+    image = records[3]
+    assert isinstance(image, Image)
+    assert image.src.startswith('book_media/') and image.src.endswith('.png')
+    assert (image.width, image.height, image.alt) == (40, 20, 'خريطة')
+    assert os.path.isfile(os.path.join(media.assets_dir, os.path.basename(image.src)))
+    assert (media.extracted, media.skipped) == (1, 0)
+
+    # Without a MediaExtractor pictures are left out
+    assert [r.text for r in iter_paragraphs(docx)] == ['الكتاب', 'الفصل الأول', 'قبل الصورة', 'بعد الصورة']
+
+def test_extracted_files_are_reused(tmp_path, picture_docx):
+    docx = picture_docx()
+    first = MediaExtractor(str(tmp_path / 'media'), url_prefix='')
+    src = [r.src for r in iter_paragraphs(docx, first) if isinstance(r, Image)]
+    second = MediaExtractor(str(tmp_path / 'media'), url_prefix='')
+    assert [r.src for r in iter_paragraphs(docx, second) if isinstance(r, Image)] == src
+    assert (second.extracted, second.skipped) == (0, 1)
+    assert '/' not in src[0]
@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import sqlite3
+
+import pytest
+
+from export_rows import (BatchLoader, ConnectionPool, ExportRow, batched, export, iter_rows, open_pool,
+                         parse_value, split_label)
+from extract_docx import Paragraph, Table, iter_paragraphs
+from synth_docx import write_synthetic_docx
+
+PROPOSAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'المقترح_العملي_لنظام_التقييم-2.docx')
+
+RECORDS = [
+    Paragraph('نظام التقييم', 'Title'),
+    Paragraph('النقاط', 'heading 1', 0),
+    Paragraph('نشاط حضر فيه = +6 نقاط', 'List Paragraph', None, 0),
+    Paragraph('نسبة الحضور = ٧٠٫٥ %', 'List Paragraph', None, 1),
+    Paragraph('بند بلا قيمة', 'List Paragraph', None, 0),
+    Paragraph('', 'Normal'),
+    Table([['المعيار', 'الوزن', ''], ['الجودة', '70%', 'ملاحظة'], ['المشاركة = 30 نقطة', 'x']]),
+]
+
+def test_parse_value_folds_arabic_digits():
+    assert parse_value('+6 نقاط') == (6.0, 'نقاط')
+    assert parse_value('٧٠٫٥ %') == (70.5, '%')
+    assert parse_value('-3') == (-3.0, None)
+    assert parse_value('لا شيء') == (None, None)
+
+def test_split_label():
+    assert split_label('نشاط = +6 نقاط') == ('نشاط', 6.0, 'نقاط')
+    assert split_label('أ = ب') == ('أ = ب', None, None)
+    assert split_label(' بند ') == ('بند', None, None)
+
+def test_iter_rows():
+    rows = list(iter_rows(RECORDS, 'x.docx'))
+    assert [(r.block, r.row, r.kind, r.section, r.item_level, r.label, r.value, r.unit) for r in rows] == [
+        (2, 0, 'list', 'النقاط', 0, 'نشاط حضر فيه', 6.0, 'نقاط'),
+        (3, 0, 'list', 'النقاط', 1, 'نسبة الحضور', 70.5, '%'),
+        (4, 0, 'list', 'النقاط', 0, 'بند بلا قيمة', None, None),
+        (6, 1, 'table', 'النقاط', None, 'الجودة', 70.0, '%'),
+        (6, 2, 'table', 'النقاط', None, 'المشاركة', 30.0, 'نقطة'),
+    ]
+    assert rows[3].cells == {'المعيار': 'الجودة', 'الوزن': '70%', 'column_3': 'ملاحظة'}
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []
+
+def test_export_writes_numbered_batches_and_drops_stale_ones(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 2000, seed=4)
+    out = str(tmp_path / 'export')
+    os.makedirs(out)
+    stale = os.path.join(out, 'rows-0099.csv')
+    open(stale, 'w').close()
+
+    total, files = export([docx], out, batch_size=100)
+    assert total > 100
+    assert not os.path.exists(stale)
+    csv_files = sorted(f for f in files if f.endswith('.csv'))
+    assert len(csv_files) == (total + 99) // 100
+    with open(csv_files[0], encoding='utf-8-sig', newline='') as f:
+        table = list(csv.reader(f))
+    assert tuple(table[0]) == ExportRow._fields and len(table) == 101
+    with open(csv_files[0].replace('.csv', '.jsonl'), encoding='utf-8') as f:
+        first = json.loads(f.readline())
+    assert first['source'] == 'book.docx' and first['label'] == table[1][6]
+
+def test_proposal_document():
+    rows = list(iter_rows(iter_paragraphs(PROPOSAL), 'proposal'))
+    assert ('نشاط حضر فيه', 6.0, 'نقاط') in [(r.label, r.value, r.unit) for r in rows]
+
+def test_batch_loader_uses_one_insert_per_batch_and_replaces_sources():
+    pool = ConnectionPool(lambda: sqlite3.connect(':memory:'))
+    loader = BatchLoader(pool)
+    rows = list(iter_rows(RECORDS, 'x.docx'))
+    for _ in range(2):
+        loader.start()
+        for batch in batched(rows, 2):
+            loader.load(batch)
+    # CREATE, then per load: one DELETE for the source and one INSERT per batch
+    assert loader.statements == 1 + 2 * (1 + 3)
+    with pool.connection() as conn:
+        stored = conn.execute('SELECT label, value, cells FROM evaluation_criteria ORDER BY block, row').fetchall()
+    assert len(stored) == len(rows)
+    assert stored[0] == ('نشاط حضر فيه', 6, None)
+    assert json.loads(stored[3][2])['الوزن'] == '70%'
+    pool.close()
+
+def test_failed_batch_rolls_back(tmp_path):
+    pool = open_pool(str(tmp_path / 'rows.db'))
+    loader = BatchLoader(pool)
+    rows = list(iter_rows(RECORDS, 'x.docx'))
+    loader.load(rows[:2])
+    with pytest.raises(sqlite3.IntegrityError):
+        loader.load(rows[2:] + rows[:1])
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM evaluation_criteria').fetchone() == (2,)
+    pool.close()
+
+def test_formula_lines_do_not_start_sections():
+    rows = {r.block: r.section for r in iter_rows(iter_paragraphs(PROPOSAL), 'proposal')}
+    # The worked example just above ends "= 49 + 18= 67 نقطة"; the items
+    # stay under the last line that reads like a title
+    assert [rows[block] for block in (33, 34, 35)] == ['● عضو شارك في نشاط واحد فقط'] * 3
+    assert [rows[block] for block in (38, 39, 40)] == ['🟩 اقتراح اختياري (يزيد الدقة)'] * 3
+    assert not any('=' in section for section in rows.values())
+
+def test_styled_headings_with_numbers_still_start_sections():
+    records = [Paragraph('نظام التقييم', 'Title'), Paragraph('المرحلة 2', 'heading 1', 0),
+               Paragraph('بند = 3 نقاط', 'List Paragraph', None, 0)]
+    assert [r.section for r in iter_rows(records, 'x.docx')] == ['المرحلة 2']
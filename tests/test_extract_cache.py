@@ -0,0 +1,81 @@
+import os
+import zipfile
+
+from conftest import png_bytes
+from docx_media import MediaExtractor
+from extract_cache import ExtractionCache, content_key
+from extract_docx import Image, Table, iter_paragraphs
+from synth_docx import write_synthetic_docx
+
+def _replace_member(path, name, data):
+    # Rewrite the archive with one member's bytes swapped
+    with zipfile.ZipFile(path) as zf:
+        members = [(info.filename, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for member, content in members:
+            zf.writestr(member, data if member == name else content)
+
+def test_hit_returns_the_same_records(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 300, seed=1)
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    first = list(cache.paragraphs(docx))
+    second = list(cache.paragraphs(docx))
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second == first == list(iter_paragraphs(docx))
+    assert [type(r) for r in second] == [type(r) for r in first]
+    assert any(isinstance(r, Table) for r in second)
+
+def test_content_change_is_a_miss(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 100, seed=1)
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    list(cache.paragraphs(docx))
+    write_synthetic_docx(docx, 100, seed=2)
+    assert list(cache.paragraphs(docx)) == list(iter_paragraphs(docx))
+    assert (cache.misses, cache.hits) == (2, 0)
+
+def test_picture_replaced_under_the_same_name_is_a_miss(tmp_path, picture_docx):
+    docx = picture_docx(width=40, height=20)
+    before = content_key(docx)
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    media = MediaExtractor(str(tmp_path / 'book_media'))
+    images = [r for r in cache.paragraphs(docx, media) if isinstance(r, Image)]
+    assert [(i.width, i.height, i.alt) for i in images] == [(40, 20, 'خريطة')]
+
+    _replace_member(docx, 'word/media/image1.png', png_bytes(80, 60))
+    assert content_key(docx) != before
+    images = [r for r in cache.paragraphs(docx, media) if isinstance(r, Image)]
+    assert [(i.width, i.height) for i in images] == [(80, 60)]
+    assert os.path.isfile(os.path.join(media.assets_dir, os.path.basename(images[0].src)))
+    assert cache.hits == 0
+
+def test_missing_media_file_is_a_miss(tmp_path, picture_docx):
+    docx = picture_docx()
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    media = MediaExtractor(str(tmp_path / 'book_media'))
+    records = list(cache.paragraphs(docx, media))
+    for name in os.listdir(media.assets_dir):
+        os.remove(os.path.join(media.assets_dir, name))
+    media = MediaExtractor(media.assets_dir)
+    assert list(cache.paragraphs(docx, media)) == records
+    assert cache.hits == 0
+    assert os.listdir(media.assets_dir)
+
+def test_trim_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path / 'cache'))
+    docs = []
+    for seed in range(3):
+        docx = str(tmp_path / f"book{seed}.docx")
+        write_synthetic_docx(docx, 200, seed=seed)
+        list(cache.paragraphs(docx))
+        docs.append(docx)
+    entries = [os.path.join(cache.cache_dir, name) for name in os.listdir(cache.cache_dir)]
+    # The first document was used last
+    for age, docx in enumerate([docs[1], docs[2], docs[0]]):
+        path = cache._path(cache.key(docx))
+        os.utime(path, ns=(age * 10 ** 9, age * 10 ** 9))
+    cache.max_bytes = sum(os.path.getsize(path) for path in entries) - 1
+    assert cache.trim() == 1
+    assert not os.path.exists(cache._path(cache.key(docs[1])))
+    assert os.path.exists(cache._path(cache.key(docs[0])))
@@ -0,0 +1,36 @@
+import zipfile
+
+import synth_docx
+from extract_docx import iter_paragraphs, load_styles
+from process_text import heading_level
+
+# A body text style that says so with outlineLvl 9, and one based on a
+# heading that overrides the heading's level the same way
+STYLES = synth_docx.STYLES.replace('</w:styles>', (
+    '<w:style w:type="paragraph" w:styleId="BodyText"><w:name w:val="Body Text"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:outlineLvl w:val="9"/></w:pPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Plain"><w:name w:val="Plain"/><w:basedOn w:val="Heading1"/>'
+    '<w:pPr><w:outlineLvl w:val="9"/></w:pPr></w:style>'
+    '</w:styles>'))
+
+def _paragraph(text, style):
+    return f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>'
+
+def test_outline_level_9_in_a_style_is_body_text(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    with zipfile.ZipFile(docx, 'w') as zf:
+        zf.writestr('[Content_Types].xml', synth_docx.CONTENT_TYPES)
+        zf.writestr('_rels/.rels', synth_docx.PACKAGE_RELS)
+        zf.writestr('word/_rels/document.xml.rels', synth_docx.DOCUMENT_RELS)
+        zf.writestr('word/styles.xml', STYLES)
+        zf.writestr('word/document.xml', synth_docx.DOCUMENT_START
+                    + _paragraph('العنوان', 'Title') + _paragraph('فصل', 'Heading1')
+                    + _paragraph('نص', 'BodyText') + _paragraph('نص آخر', 'Plain')
+                    + synth_docx.DOCUMENT_END)
+    with zipfile.ZipFile(docx) as zf:
+        styles = load_styles(zf)
+    assert styles['BodyText'] == ('Body Text', None, False)
+    assert styles['Plain'] == ('Plain', None, False)
+    assert styles['Heading1'] == ('heading 1', 0, False)
+    records = list(iter_paragraphs(docx))
+    assert [(r.outline_level, heading_level(r)) for r in records] == [(None, 1), (0, 2), (None, 0), (None, 0)]
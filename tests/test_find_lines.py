@@ -0,0 +1,24 @@
+from find_lines import find_lines
+
+def _run(tmp_path, capsys, text):
+    path = tmp_path / 'book.md'
+    path.write_text(text, encoding='utf-8')
+    find_lines(str(path))
+    return capsys.readouterr().out.splitlines()
+
+def test_blank_line_before_bullet_heading(tmp_path, capsys):
+    out = _run(tmp_path, capsys, "# الفصل\n\n\n## • بند\nنص\n")
+    assert out == ["Found bullet heading at line 4: ## • بند"]
+
+def test_indented_bullet_heading(tmp_path, capsys):
+    out = _run(tmp_path, capsys, "مقدمة\n\n \t## • بند\n")
+    assert out == ["Found bullet heading at line 3: ## • بند"]
+
+def test_bullet_on_a_later_line_is_not_a_heading(tmp_path, capsys):
+    out = _run(tmp_path, capsys, "## عنوان\n• بند\n")
+    assert out == []
+
+def test_index_marker_and_heading_on_one_line(tmp_path, capsys):
+    out = _run(tmp_path, capsys, "\n## • دليل الكتاب\n")
+    assert sorted(out) == ["Found 'دليل الكتاب' at line 2: ## • دليل الكتاب",
+                           "Found bullet heading at line 2: ## • دليل الكتاب"]
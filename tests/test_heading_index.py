@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import cleanup_and_regenerate
+import find_bullet
+import find_index_start
+import list_headings
+from heading_index import CountingWriter, fresh_index, index_path, load_index, StaleIndexError, write_index
+from search_text import MultiSearch
+
+# Padded past the 100 TOC lines the scanning fallbacks skip
+PADDING = '\n' * 100
+
+def _write_indexed(path, headings):
+    # Write path together with an up-to-date sidecar index, like pipeline.emit
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = CountingWriter(f)
+        writer.write(PADDING)
+        for level, title in headings:
+            writer.write_heading(f"{'#' * level} {title}\n", level, title, title, '#')
+            writer.write("نص\n")
+        writer.close_sections()
+    write_index(path, writer)
+
+def test_fresh_index_matches_the_file(tmp_path):
+    path = str(tmp_path / 'book.md')
+    _write_indexed(path, [(2, 'أول'), (2, 'ثان')])
+    index = fresh_index(path)
+    assert [h['title'] for h in index['headings']] == ['أول', 'ثان']
+    first = index['headings'][0]
+    with open(path, 'rb') as f:
+        assert f.read()[first['offset']:].startswith('## أول'.encode('utf-8'))
+    assert first['line'] == 101
+
+def test_fresh_index_is_none_when_missing_or_stale(tmp_path, capsys):
+    path = str(tmp_path / 'book.md')
+    _write_indexed(path, [(2, 'أول')])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("## • جديد\n")
+    with pytest.raises(StaleIndexError):
+        load_index(path)
+    assert fresh_index(path) is None
+    assert 'stale' in capsys.readouterr().out
+    os.remove(index_path(path))
+    assert fresh_index(path) is None
+
+def test_clis_fall_back_to_scanning_on_a_stale_index(tmp_path, capsys):
+    path = str(tmp_path / 'book.md')
+    _write_indexed(path, [(2, 'أول')])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("## • جديد\n## دليل الكتاب\n")
+    capsys.readouterr()
+
+    find_bullet.find_bullet_heading(path)
+    assert "Found bullet heading at line 103: ## • جديد" in capsys.readouterr().out
+    list_headings.list_headings(path)
+    assert "Line 104: ## دليل الكتاب" in capsys.readouterr().out
+    find_index_start.find_index_start(path)
+    assert "Found 'دليل الكتاب' at line 104" in capsys.readouterr().out
+    matches = MultiSearch(literals=['جديد']).search_file(path, with_sections=True)
+    assert [m.section for m in matches] == [None]
+
+def test_clis_use_a_fresh_index(tmp_path, capsys):
+    path = str(tmp_path / 'book.md')
+    _write_indexed(path, [(2, 'أول'), (3, '• بند')])
+    find_bullet.find_bullet_heading(path)
+    assert capsys.readouterr().out == "Found bullet heading at line 103: ### • بند\n"
+    matches = MultiSearch(literals=['بند']).search_file(path, with_sections=True)
+    assert [m.section for m in matches] == ['• بند']
+
+def test_rewriting_tools_discard_the_index(tmp_path):
+    path = str(tmp_path / 'book.md')
+    _write_indexed(path, [(2, 'أول'), (2, '• بند')])
+    cleanup_and_regenerate.cleanup_and_regenerate(path)
+    assert not os.path.exists(index_path(path))
+    assert fresh_index(path) is None
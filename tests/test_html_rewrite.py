@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+from cleanup_html import ARMY_TABLE_TYPO, cleanup_html
+from generate_toc import render_toc_list
+from html_rewrite import (DropRange, PruneToc, ReplaceRange, Select, iter_blocks, iter_tokens,
+                          prune_toc, rewrite)
+
+PAGE = ('<!DOCTYPE html><html><head><style>p { color: red; }</style></head><body>'
+        '<div class="container"><h1>العنوان</h1>'
+        '<div class="toc"><h2>فهرس المحتويات</h2><ul><li><a href="#a">أ</a></li>'
+        '<li><a href="#b">ب</a></li></ul></div>'
+        '<h2 id="a">أ</h2><p>نص <b>عريض</b> هنا</p>'
+        '<h2 id="b">ب</h2><p>يُحذف</p><p>النهاية</p></div></body></html>')
+
+def _merged(tokens):
+    # Text may be cut at chunk boundaries; tags never are
+    merged = []
+    for token in tokens:
+        if merged and not token.startswith('<') and not merged[-1].startswith('<'):
+            merged[-1] += token
+        else:
+            merged.append(token)
+    return merged
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+@pytest.mark.parametrize('text, expected', [
+    ('<p class="x">نص <b>عريض</b></p>\n', ['<p class="x">', 'نص ', '<b>', 'عريض', '</b>', '</p>', '\n']),
+    ('a<b <c>d', ['a', '<b <c>', 'd']),
+    ('<<x>', ['<<x>']),
+    ('x<y', ['x', '<y']),
+    ('<a', ['<a']),
+    ('a>b<c>', ['a>b', '<c>']),
+    ('', []),
+])
+def test_tokens(text, expected, chunk_size):
+    assert _merged(iter_tokens(io.StringIO(text), chunk_size)) == expected
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 64, 1 << 16])
+def test_page_round_trips(chunk_size):
+    assert ''.join(iter_tokens(io.StringIO(PAGE), chunk_size)) == PAGE
+
+def test_tags_never_split_across_chunks():
+    for token in iter_tokens(io.StringIO(PAGE), 5):
+        if token.startswith('<'):
+            assert token.endswith('>')
+
+def test_blocks_pass_containers_through():
+    items = list(iter_blocks(iter_tokens(io.StringIO(PAGE))))
+    tags = [item.tag for item in items if not isinstance(item, str)]
+    assert tags == ['h1', 'div', 'h2', 'p', 'h2', 'p', 'p']
+
+def test_prune_toc_keeps_surviving_entries():
+    raw = '<div class="toc">' + render_toc_list([(2, 'أ', 'a'), (3, 'ب', 'b'), (2, 'ج', 'c')]) + '</div>'
+    pruned, removed = prune_toc(raw, {'a', 'c'})
+    assert removed == 1
+    assert pruned == '<div class="toc">' + render_toc_list([(2, 'أ', 'a'), (2, 'ج', 'c')]) + '</div>'
+
+def test_rewrite_applies_all_rules_in_one_pass(tmp_path):
+    source = tmp_path / 'page.html'
+    source.write_text(PAGE, encoding='utf-8')
+    rules = [
+        ReplaceRange('bold', Select('p', contains='عريض'), Select('p', contains='عريض'), '<p>بديل</p>'),
+        DropRange('tail', Select('h2', text='ب'), Select('p', text='النهاية')),
+        PruneToc('toc', Select('div', cls='toc')),
+    ]
+    applied = rewrite(str(source), str(source), rules, chunk_size=16)
+    html = source.read_text(encoding='utf-8')
+    assert applied == {'bold': 1, 'tail': 1, 'toc': 1}
+    assert '<p>بديل</p>' in html and 'يُحذف' not in html and '<p>النهاية</p>' in html
+    assert '#b' not in html and '#a' in html
+
+@pytest.mark.parametrize('rule', [
+    ReplaceRange('table', Select('h2', text='ب'), Select('h2', text='غير موجود'), '<p>بديل</p>'),
+    DropRange('index', Select('h2', text='ب'), Select('div', cls='footer')),
+])
+def test_range_without_an_end_leaves_the_page_alone(tmp_path, rule):
+    source = tmp_path / 'page.html'
+    source.write_text(PAGE, encoding='utf-8')
+    applied = rewrite(str(source), str(source), [rule, PruneToc('toc', Select('div', cls='toc'))], chunk_size=16)
+    assert applied == {rule.name: 0, 'toc': 0}
+    assert source.read_text(encoding='utf-8') == PAGE
+
+def test_cleanup_html_reports_a_missing_table_end(tmp_path, capsys):
+    page = PAGE.replace('<p>يُحذف</p>', f'<p>{ARMY_TABLE_TYPO} الجيش</p>')
+    source = tmp_path / 'page.html'
+    source.write_text(page, encoding='utf-8')
+    cleanup_html(str(source))
+    assert 'Could not find typo start or table end' in capsys.readouterr().out
+    assert source.read_text(encoding='utf-8') == page
@@ -0,0 +1,106 @@
+import pytest
+
+from extract_docx import Image, Paragraph, iter_paragraphs
+from lint import Linter, RULES, format_finding, lint_report
+from synth_docx import write_synthetic_docx
+
+def heading(text, level=1):
+    return Paragraph(text, f'heading {level}', level - 1)
+
+def body(text):
+    return Paragraph(text, 'Normal')
+
+def _rules(findings):
+    return [(f.rule, f.paragraph) for f in findings]
+
+def test_mixed_script():
+    findings = Linter(['mixed-script']).run([body('العنوان'), body('كان عَدَدE الجيش كبيراً و PDF لا بأس')])
+    assert [(f.paragraph, f.column, f.excerpt, f.severity) for f in findings] == [(1, 4, 'عَدَدE', 'error')]
+
+def test_glued_digits_but_not_in_a_toc():
+    records = [
+        body('العنوان'),
+        heading('الفتنة الكبرى1'),
+        body('قال 12 رجلا، وذكر ٣رجال.'),
+        heading('فهرس المحتويات'),
+        body('1. الفتنة الكبرى 12'),
+    ]
+    findings = Linter(['glued-digits']).run(records)
+    assert [(f.paragraph, f.excerpt) for f in findings] == [(1, 'الكبرى1'), (2, '٣رجال.')]
+
+def test_bullet_and_long_headings_only_look_at_headings():
+    records = [body('العنوان'), heading('• بند'), body('• بند في النص'), heading('ع' * 120)]
+    assert _rules(Linter(['bullet-heading', 'long-heading']).run(records)) == \
+        [('bullet-heading', 1), ('long-heading', 3)]
+
+def test_empty_section_respects_nesting():
+    records = [
+        body('العنوان'),
+        heading('فارغ'),
+        heading('أب'),
+        heading('ابن', 2),
+        body('نص'),
+        heading('صورة'),
+        Image('media/a.png', 1, 1, ''),
+        heading('آخر'),
+    ]
+    findings = Linter(['empty-section']).run(records)
+    assert [(f.paragraph, f.excerpt) for f in findings] == [(1, 'فارغ'), (7, 'آخر')]
+
+def test_duplicate_section_tells_same_from_different_content():
+    records = [
+        body('العنوان'),
+        heading('الجَمَل'), body('نص'),
+        heading('صفين'), body('نص'),
+        heading('الجمل'), body('نص'),
+        heading('صفين'), body('نص آخر'),
+    ]
+    findings = Linter(['duplicate-section']).run(records)
+    assert [(f.paragraph, f.message) for f in findings] == [
+        (5, 'repeats the heading of paragraph 1 with identical content'),
+        (7, 'repeats the heading of paragraph 3 with different content'),
+    ]
+
+def test_orphaned_toc_target():
+    records = [
+        body('العنوان'),
+        heading('فهرس المحتويات'),
+        body('1. معركة الجمل ...... 5'),
+        body('2. معركة القادسية 9'),
+        heading('مَعْرَكَةُ الجَمَلِ'),
+        body('نص'),
+    ]
+    findings = Linter(['orphaned-toc-target']).run(records)
+    assert [(f.paragraph, f.excerpt, f.section) for f in findings] == [(3, 'معركة القادسية', 'فهرس المحتويات')]
+
+def test_watch_passes_records_through():
+    records = [body('العنوان'), heading('• بند'), body('نص')]
+    linter = Linter()
+    assert list(linter.watch(iter(records))) == records
+    assert _rules(linter.findings()) == [('bullet-heading', 1)]
+
+def test_unknown_rule_is_rejected():
+    with pytest.raises(ValueError):
+        Linter(['no-such-rule'])
+
+def test_sharded_run_matches_serial(tmp_path):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 3000, seed=5)
+    records = list(iter_paragraphs(docx))
+    # Something for the local rules to find, in two different shards
+    records[10] = body('عَدَدE')
+    records[2500] = body('الكبرى1')
+    serial = Linter().run(records)
+    sharded = Linter(workers=2, shard_size=400).run(records)
+    assert sharded == serial
+    assert {'mixed-script', 'glued-digits'} <= {f.rule for f in serial}
+
+def test_report_counts_and_format():
+    findings = Linter().run([body('العنوان'), heading('• بند'), body('نص'), heading('ع' * 120), body('نص')])
+    report = lint_report(findings)
+    assert report['counts'] == {'error': 1, 'warning': 1}
+    assert format_finding(findings[0]) == "1:0: error: [bullet-heading] bullet line rendered as a heading: • بند"
+
+def test_every_rule_is_registered_once():
+    assert set(RULES) == {'mixed-script', 'glued-digits', 'bullet-heading', 'long-heading',
+                          'empty-section', 'duplicate-section', 'orphaned-toc-target'}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from extract_docx import Paragraph
+from pipeline import load_document, section_anchors
+from search_index import SearchIndex, _decode, _encode, normalize, search_index_path, tokenize, write_search_index
+
+def _doc():
+    heading = lambda text: Paragraph(text, 'heading 1', 0)
+    body = lambda text: Paragraph(text, 'Normal')
+    return load_document([
+        Paragraph('رِحْلَةُ الحَجِّ', 'Title'),
+        body('مُقَدِّمَةٌ قَصِيرَةٌ.'),
+        heading('مَعْرَكَةُ الجَمَلِ'),
+        body('قَالَ الإِمَامُ عَلِيٌّ رَضِيَ اللَّهُ عَنْهُ.'),
+        body('وَخَرَجَ الجَيْشُ إِلَى البَصْرَةِ، وَخَرَجَ النَّاسُ.'),
+        heading('صِفِّينَ'),
+        body('خَرَجَ الإِمَامُ عَلِيٌّ إِلَى صِفِّينَ.'),
+    ])
+
+@pytest.fixture
+def index(tmp_path):
+    doc = _doc()
+    path = search_index_path(str(tmp_path / 'book.html'))
+    write_search_index(doc, path, section_anchors(doc))
+    return SearchIndex.load(path)
+
+def test_normalize_folds_diacritics_and_hamza_seats():
+    assert normalize('الإِمَامُ') == normalize('الامام') == 'الامام'
+    assert normalize('مَدِينَةٌ') == 'مدينه'
+    assert tokenize('قَالَ: الإِمَامُ، عَلِيٌّ!') == ['قال', 'الامام', 'علي']
+
+def test_postings_round_trip():
+    entries = [(0, [0, 4, 9]), (3, [2]), (7, [1, 2, 3])]
+    assert _decode(_encode(entries)) == entries
+
+def test_index_path_sits_next_to_the_html(tmp_path):
+    assert search_index_path(os.path.join('out', 'book.html')) == os.path.join('out', 'book.search.json')
+
+def test_unvocalized_query_finds_vocalized_text(index):
+    hits = index.search('علي')
+    assert [hit.title for hit in hits] == ['مَعْرَكَةُ الجَمَلِ', 'صِفِّينَ']
+    assert hits[0].anchor == 'مَعْرَكَةُ-الجَمَلِ'
+
+def test_more_hits_rank_first(index):
+    hits = index.search('وخرج')
+    assert [(hit.title, len(hit.positions)) for hit in hits] == [('مَعْرَكَةُ الجَمَلِ', 2)]
+
+def test_all_words_must_match(index):
+    assert [hit.title for hit in index.search('الإمام صفين')] == ['صِفِّينَ']
+    assert index.search('الامام مقدمة') == []
+
+def test_phrase_needs_consecutive_words(index):
+    assert [hit.title for hit in index.search('الامام علي', phrase=True)] == ['مَعْرَكَةُ الجَمَلِ', 'صِفِّينَ']
+    assert index.search('علي الامام', phrase=True) == []
+
+def test_front_matter_is_searchable(index):
+    hits = index.search('مقدمة')
+    assert [(hit.anchor, hit.title) for hit in hits] == [(None, None)]
+
+def test_version_mismatch_is_rejected():
+    with pytest.raises(ValueError):
+        SearchIndex({'version': 0, 'sections': [], 'terms': {}})
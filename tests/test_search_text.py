@@ -0,0 +1,15 @@
+from search_text import MultiSearch
+
+def test_literals_and_regexes_report_every_hit_with_its_line(tmp_path):
+    path = tmp_path / 'book.md'
+    path.write_text("# الكتاب\n\n## • دليل الكتاب\nنص دليل الكتاب\n", encoding='utf-8')
+    search = MultiSearch(literals=['دليل الكتاب', 'الكتاب'], regexes=[r'^#+ .*•'])
+    matches = search.search_file(str(path))
+    assert [(m.pattern, m.line) for m in matches] == [
+        ('الكتاب', 1),
+        (r'^#+ .*•', 3), ('دليل الكتاب', 3), ('الكتاب', 3),
+        ('دليل الكتاب', 4), ('الكتاب', 4),
+    ]
+    assert matches[1].text == '## • دليل الكتاب'
+    data = path.read_bytes()
+    assert all(data[m.offset:m.end].decode('utf-8') == m.pattern for m in matches if m.pattern != r'^#+ .*•')
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import struct
+import subprocess
+from urllib.parse import quote, unquote
+
+import pytest
+
+from extract_docx import Image, Paragraph
+from generate_toc import parse_toc_list
+from pipeline import heading_registry, load_document, render_block, section_anchors
+from split_output import SHELL_SCRIPT, write_split
+
+def _png(path, width, height):
+    # Just the header; enough for a file the page links to
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height))
+
+def _heading(text, level=2):
+    # Heading 1 -> h2, Heading 2 -> h3
+    return Paragraph(text, f'Heading {level - 1}', level - 2, None)
+
+def _body(text):
+    return Paragraph(text, 'Normal', None, None)
+
+def _doc(media_name='00000001-24.png'):
+    src = f"book_media/{media_name}"
+    return load_document([
+        Paragraph('الكتاب', 'Title', None, None),
+        _heading('الفصل الأول'),
+        _body('نص'),
+        Image(src, 4, 3, 'صورة'),
+        _heading('قسم', 3),
+        _heading('الفصل الثاني'),
+        Image(src, 4, 3, 'صورة'),
+    ])
+
+def _split(doc, tmp_path, **kwargs):
+    out = str(tmp_path / 'split')
+    return out, write_split(doc, out, render_block, section_anchors(doc), **kwargs)
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def test_media_is_copied_next_to_the_chapters(tmp_path):
+    media_dir = tmp_path / 'book_media'
+    media_dir.mkdir()
+    _png(media_dir / '00000001-24.png', 4, 3)
+    out, manifest = _split(_doc(), tmp_path, media_dir=str(media_dir))
+
+    assert manifest['media'] == {'media/00000001-24.png': 'media/00000001-24.png'}
+    assert os.path.isfile(os.path.join(out, 'media', '00000001-24.png'))
+    for chapter in manifest['chapters']:
+        html = _read(os.path.join(out, chapter['file']))
+        assert 'src="media/00000001-24.png"' in html
+        assert 'book_media/' not in html
+
+def test_hashed_media_is_listed_in_the_manifest_and_diff(tmp_path):
+    media_dir = tmp_path / 'book_media'
+    media_dir.mkdir()
+    _png(media_dir / '00000001-24.png', 4, 3)
+    out, manifest = _split(_doc(), tmp_path, media_dir=str(media_dir), hashed=True)
+
+    asset = manifest['assets']['media/00000001-24.png']
+    assert asset['file'] == f"assets/{asset['sha256'][:16]}.png"
+    assert manifest['media']['media/00000001-24.png'] == asset['file']
+    assert os.path.isfile(os.path.join(out, asset['file']))
+    assert 'media/00000001-24.png' in manifest['diff']['added']
+    assert asset['file'] in manifest['diff']['upload']
+    chapter = _read(os.path.join(out, manifest['chapters'][0]['file']))
+    assert f'src="{asset["file"]}"' in chapter
+
+    # A picture replaced in place changes its asset and the chapters using it
+    _png(media_dir / '00000001-24.png', 8, 6)
+    out, rebuilt = _split(_doc(), tmp_path, media_dir=str(media_dir), hashed=True)
+    assert 'media/00000001-24.png' in rebuilt['diff']['changed']
+    assert rebuilt['assets']['media/00000001-24.png']['file'] != asset['file']
+    with open(os.path.join(out, 'deploy-diff.json'), encoding='utf-8') as f:
+        assert json.load(f) == rebuilt['diff']
+
+def test_missing_media_keeps_its_src(tmp_path):
+    out, manifest = _split(_doc(), tmp_path, media_dir=str(tmp_path / 'nowhere'))
+    assert manifest['media'] == {}
+    assert 'src="book_media/00000001-24.png"' in _read(os.path.join(out, manifest['chapters'][0]['file']))
+
+def test_index_toc_is_nested_like_the_page_toc(tmp_path):
+    doc = _doc()
+    out, manifest = _split(doc, tmp_path)
+    shell = _read(os.path.join(out, 'index.html'))
+    toc = shell[shell.index('<div class="toc">'):]
+    toc = toc[:toc.index('</div>') + len('</div>')]
+    assert parse_toc_list(toc) == [(0, 'الفصل الأول', 'الفصل-الأول'),
+                                   (1, 'قسم', 'قسم'),
+                                   (0, 'الفصل الثاني', 'الفصل-الثاني')]
+    assert toc == heading_registry(doc).toc_html()
+
+def test_anchors_round_trip_through_percent_encoding(tmp_path):
+    # What location.hash holds after a click on a TOC link
+    out, manifest = _split(_doc(), tmp_path)
+    shell = _read(os.path.join(out, 'index.html'))
+    for number, chapter in enumerate(manifest['chapters']):
+        for anchor in chapter['anchors']:
+            fragment = quote(anchor, safe='-')
+            assert fragment != anchor
+            assert unquote(fragment) == anchor
+            assert f'href="#{anchor}"' in shell
+            assert f'id="{anchor}"' in _read(os.path.join(out, chapter['file']))
+    assert 'decodeURIComponent(location.hash.slice(1))' in shell
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="needs node")
+def test_loader_finds_the_chapter_of_an_encoded_hash(tmp_path):
+    out, manifest = _split(_doc(), tmp_path)
+    shell = _read(os.path.join(out, 'index.html'))
+    chapters = shell[shell.index('id="chapters">') + len('id="chapters">'):]
+    chapters = chapters[:chapters.index('</script>')]
+    anchor = manifest['chapters'][1]['anchors'][0]
+    # Just enough of a browser for the loader: it asks for the chapter
+    # file, then for the element to scroll to
+    harness = f"""
+var requested = [], looked_up = [];
+var elements = {{chapters: {{textContent: {json.dumps(chapters)}}}, content: {{}}}};
+global.document = {{getElementById: function (id) {{
+    if (id in elements) return elements[id];
+    looked_up.push(id);
+    return null;
+}}}};
+global.location = {{hash: '#' + {json.dumps(quote(anchor, safe='-'))}}};
+global.window = {{addEventListener: function () {{}}, scrollTo: function () {{}}}};
+global.fetch = function (file) {{
+    requested.push(file);
+    return Promise.resolve({{ok: true, text: function () {{ return Promise.resolve(''); }}}});
+}};
+{SHELL_SCRIPT}
+setTimeout(function () {{ console.log(JSON.stringify([requested[0], looked_up[0]])); }}, 10);
+"""
+    result = subprocess.run(['node', '-e', harness], capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [manifest['chapters'][1]['file'], anchor]
+
+def test_inserting_a_chapter_uploads_only_that_chapter(tmp_path):
+    records = [Paragraph('الكتاب', 'Title', None, None)]
+    for n in range(1, 11):
+        records += [_heading(f'الفصل {n}'), _body(f'نص الفصل {n} ' * 50)]
+    out, first = _split(load_document(records), tmp_path, hashed=True)
+    records[3:3] = [_heading('فصل جديد'), _body('نص جديد')]
+    out, second = _split(load_document(records), tmp_path, hashed=True)
+
+    diff = second['diff']
+    new = next(c for c in second['chapters'] if c['title'] == 'فصل جديد')
+    index = second['assets']['index.html']
+    assert diff['upload'] == sorted([new['file'], 'index.html'])
+    assert diff['upload_bytes'] == new['bytes'] + index['bytes']
+    assert diff['added'] == [f"chapters/{new['anchors'][0]}.html"]
+    assert diff['changed'] == ['index.html'] and diff['removed'] == []
+    assert {c['file'] for c in first['chapters']} < {c['file'] for c in second['chapters']}
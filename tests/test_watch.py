@@ -0,0 +1,77 @@
+import os
+import zipfile
+
+from search_index import search_index_path
+from synth_docx import write_synthetic_docx
+from watch import WatchedBook, file_stamp
+
+def _book(tmp_path, seed=0):
+    docx = str(tmp_path / 'book.docx')
+    write_synthetic_docx(docx, 300, seed=seed)
+    return WatchedBook(docx, str(tmp_path / 'book.html'), str(tmp_path / 'book.md'))
+
+def _edit_last_paragraph(path):
+    with zipfile.ZipFile(path) as zf:
+        members = [(info.filename, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            if name == 'word/document.xml':
+                cut = data.rindex(b'</w:t>')
+                data = data[:cut] + ' تعديل'.encode('utf-8') + data[cut:]
+            zf.writestr(name, data)
+
+def test_file_stamp(tmp_path):
+    assert file_stamp(str(tmp_path / 'missing.docx')) is None
+    path = tmp_path / 'a.txt'
+    path.write_bytes(b'abc')
+    assert file_stamp(str(path))[1] == 3
+
+def test_changes_are_debounced(tmp_path):
+    book = _book(tmp_path)
+    book.poll(10.0)
+    assert not book.due(10.1, 0.25)
+    # Another save inside the window pushes the build back
+    os.utime(book.source, ns=(1, 1))
+    book.poll(10.2)
+    assert not book.due(10.4, 0.25)
+    assert book.due(10.45, 0.25)
+    book.poll(10.5)
+    assert book.due(10.5, 0.25)
+
+def test_rebuild_writes_outputs_and_reuses_sections(tmp_path, capsys):
+    book = _book(tmp_path)
+    book.poll(0.0)
+    book.rebuild()
+    assert os.path.exists(book.output_html) and os.path.exists(book.output_md)
+    assert os.path.exists(search_index_path(book.output_html))
+    rendered = book.cache.misses
+    assert rendered and book.cache.hits == 0
+    assert book.changed_at is None
+
+    # Saved again without changes: nothing is rebuilt
+    book.rebuild()
+    assert 'skipped' in capsys.readouterr().out.splitlines()[-1]
+
+    # One paragraph edited: only its section is rendered again
+    _edit_last_paragraph(book.source)
+    book.poll(1.0)
+    hits = book.cache.hits
+    book.rebuild()
+    assert book.cache.misses == rendered + 1
+    assert book.cache.hits == hits + rendered - 1
+    with open(book.output_md, encoding='utf-8') as f:
+        assert 'تعديل' in f.read()
+
+def test_missing_or_broken_source_waits(tmp_path, capsys):
+    book = _book(tmp_path)
+    os.remove(book.source)
+    book.poll(0.0)
+    book.rebuild()
+    assert 'missing' in capsys.readouterr().out
+
+    with open(book.source, 'wb') as f:
+        f.write(b'PK half a zip')
+    book.poll(1.0)
+    book.rebuild()
+    assert 'build failed' in capsys.readouterr().out
+    assert book.built_key is None
@@ -0,0 +1,102 @@
+import argparse
+import os
+import time
+import zipfile
+
+from batch_convert import output_names
+from build_cache import MemorySectionCache
+from extract_cache import content_key
+from pipeline import DEFAULT_STAGES, build
+from search_index import search_index_stage
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class WatchedBook:
+    # One source document and its outputs. The section cache lives as long
+    # as the watcher, so a rebuild only renders the sections that changed.
+    def __init__(self, source, output_html, output_md, search_index=True):
+        self.source = source
+        self.output_html = output_html
+        self.output_md = output_md
+        self.stages = list(DEFAULT_STAGES)
+        if search_index:
+            self.stages.append(search_index_stage(output_html))
+        self.cache = MemorySectionCache()
+        self.stamp = None
+        self.changed_at = None
+        self.built_key = None
+
+    def poll(self, now):
+        stamp = file_stamp(self.source)
+        if stamp != self.stamp:
+            self.stamp = stamp
+            self.changed_at = now
+
+    def due(self, now, debounce):
+        # A burst of saves keeps pushing changed_at forward; build once the
+        # file has been quiet for the debounce period
+        return self.changed_at is not None and now - self.changed_at >= debounce
+
+    def rebuild(self):
+        self.changed_at = None
+        if self.stamp is None:
+            print(f"{self.source}: missing, waiting for it to come back")
+            return
+        started = time.perf_counter()
+        try:
+            key = content_key(self.source)
+            if key == self.built_key:
+                print(f"{self.source}: saved without content changes, skipped")
+                return
+            hits, misses = self.cache.hits, self.cache.misses
+            doc = build(self.source, self.output_html, self.output_md, stages=self.stages, cache=self.cache)
+        except (OSError, zipfile.BadZipFile, KeyError, SyntaxError) as e:
+            # Usually a save still in progress; the next change retries
+            print(f"{self.source}: build failed ({e}), waiting for the next save")
+            return
+        self.built_key = key
+        elapsed = time.perf_counter() - started
+        print(f"{self.source}: rebuilt {len(doc.sections) - 1} sections in {elapsed * 1000:.0f} ms "
+              f"({self.cache.hits - hits} reused, {self.cache.misses - misses} rendered)")
+
+def watch(books, interval=0.1, debounce=0.25):
+    now = time.monotonic()
+    for book in books:
+        book.poll(now)
+        book.changed_at = now - debounce
+    print(f"Watching {len(books)} document(s); Ctrl+C to stop")
+    while True:
+        now = time.monotonic()
+        for book in books:
+            book.poll(now)
+            if book.due(now, debounce):
+                book.rebuild()
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the HTML and Markdown book whenever the .docx is saved")
+    parser.add_argument('sources', nargs='+', help=".docx documents to watch")
+    parser.add_argument('--html', default="processed_journey.html", help="HTML output (single document)")
+    parser.add_argument('--md', default="processed_journey.md", help="Markdown output (single document)")
+    parser.add_argument('-o', '--output-dir', default='.', help="output folder when watching several documents")
+    parser.add_argument('--interval', type=float, default=0.1, help="seconds between polls")
+    parser.add_argument('--debounce', type=float, default=0.25, help="quiet time before rebuilding")
+    parser.add_argument('--no-search-index', action='store_true')
+    args = parser.parse_args()
+
+    if len(args.sources) == 1:
+        books = [WatchedBook(args.sources[0], args.html, args.md, not args.no_search_index)]
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        books = [WatchedBook(source, os.path.join(args.output_dir, f"{name}.html"),
+                             os.path.join(args.output_dir, f"{name}.md"), not args.no_search_index)
+                 for source, name in zip(args.sources, output_names(args.sources))]
+    try:
+        watch(books, args.interval, args.debounce)
+    except KeyboardInterrupt:
+        print("Stopped.")